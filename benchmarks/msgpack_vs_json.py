@@ -0,0 +1,75 @@
+"""
+Compare encode/decode time and wire size of the orjson and ormsgpack paths
+on a numeric payload, both wrapped in the drfexts response envelope:
+
+    PYTHONPATH=. python benchmarks/msgpack_vs_json.py --rows 100000
+"""
+import argparse
+import datetime
+import io
+import time
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(REST_FRAMEWORK={"DATETIME_FORMAT": "%Y-%m-%dT%H:%M:%S%z"})
+    django.setup()
+
+from rest_framework.response import Response  # noqa: E402
+
+from drfexts.parsers import CustomJSONParser, CustomMessagePackParser  # noqa: E402
+from drfexts.renderers import (  # noqa: E402
+    CustomJSONRenderer,
+    CustomMessagePackRenderer,
+)
+
+
+def make_rows(rows):
+    started_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": i,
+            "sensor": i % 128,
+            "value": i * 0.001,
+            "readings": [i * 0.5, i * 0.25, i * 0.125, i * 0.0625],
+            "ok": bool(i % 2),
+            "measured_at": started_at + datetime.timedelta(seconds=i),
+        }
+        for i in range(rows)
+    ]
+
+
+def bench(renderer, parser, data, repeat):
+    encode = decode = 0.0
+    content = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = renderer.render(data, renderer_context={"response": Response()})
+        encode += time.perf_counter() - started
+
+        started = time.perf_counter()
+        parser.parse(io.BytesIO(content), parser_context={})
+        decode += time.perf_counter() - started
+
+    return encode / repeat, decode / repeat, len(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_rows(args.rows)
+    print(f"{'format':<10}{'encode(ms)':>12}{'decode(ms)':>12}{'bytes':>14}")
+    for name, renderer, body_parser in (
+        ("json", CustomJSONRenderer(), CustomJSONParser()),
+        ("msgpack", CustomMessagePackRenderer(), CustomMessagePackParser()),
+    ):
+        encode, decode, size = bench(renderer, body_parser, data, args.repeat)
+        print(f"{name:<10}{encode * 1000:>12.1f}{decode * 1000:>12.1f}{size:>14}")
+
+
+if __name__ == "__main__":
+    main()
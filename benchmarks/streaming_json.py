@@ -0,0 +1,92 @@
+"""
+Compare the buffered `page=all` path with `CustomJSONRenderer.render_stream`.
+
+Rows are synthesized in Python so the numbers isolate the render path:
+
+    PYTHONPATH=. python benchmarks/streaming_json.py --rows 200000 --chunk-size 2000
+"""
+import argparse
+import datetime
+import time
+import tracemalloc
+from decimal import Decimal
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(REST_FRAMEWORK={"COERCE_DECIMAL_TO_STRING": True})
+    django.setup()
+
+from rest_framework.response import Response  # noqa: E402
+
+from drfexts.renderers import CustomJSONRenderer  # noqa: E402
+from drfexts.utils import chunked  # noqa: E402
+
+
+def make_row(i):
+    return {
+        "id": i,
+        "code": f"D{i:08d}",
+        "name": f"字典项 {i}",
+        "price": Decimal(i) / 100,
+        "status": "已生效",
+        "category": {"id": i % 50, "label": f"分类 {i % 50}"},
+        "updated_at": datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=i),
+    }
+
+
+def run_buffered(rows):
+    renderer = CustomJSONRenderer()
+    started = time.perf_counter()
+    data = [make_row(i) for i in range(rows)]
+    response = Response()
+    payload = {"total": rows, "page_size": rows, "current_page": 1, "results": data}
+    content = renderer.render(payload, renderer_context={"response": response})
+    return time.perf_counter() - started, len(content)
+
+
+def run_streaming(rows, chunk_size):
+    renderer = CustomJSONRenderer()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    chunks = chunked((make_row(i) for i in range(rows)), chunk_size)
+    extra = lambda total: {"total": total, "page_size": total, "current_page": 1}  # noqa
+    for part in renderer.render_stream(chunks, extra=extra):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(part)
+    return first_byte, size
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte, size = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'ttfb(s)':>10}{'total(s)':>10}{'peak(MiB)':>12}{'bytes':>14}")
+    for name, func, func_args in (
+        ("buffered", run_buffered, (args.rows,)),
+        ("streaming", run_streaming, (args.rows, args.chunk_size)),
+    ):
+        first_byte, elapsed, peak, size = measure(func, *func_args)
+        print(
+            f"{name:<10}{first_byte:>10.3f}{elapsed:>10.3f}"
+            f"{peak / 1024 / 1024:>12.1f}{size:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
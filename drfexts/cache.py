@@ -0,0 +1,163 @@
+"""
+Rendered response cache with model tag invalidation.
+
+Every cached entry is keyed with the current version token of each model it
+read. Saving or deleting an instance of such a model replaces the token, so
+the stale entries are never looked up again and simply expire. The token is
+replaced once the transaction of the change commits, so that responses read
+before it are never cached under the new token.
+
+Only the models passed to `register_model` are hooked, the models of
+`StatusQuerySet` are registered when they are loaded.
+"""
+import functools
+import uuid
+
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.settings import api_settings
+
+__all__ = [
+    "get_cache",
+    "model_tag",
+    "register_model",
+    "invalidate_model",
+    "get_tag_versions",
+    "get_serializer_models",
+    "record_cache_event",
+    "get_cache_stats",
+]
+
+TAG_VERSION_KEY = "drfexts:tag:{}"
+STATS_KEY = "drfexts:stats:{}:{}"
+
+_registered_tags = set()
+
+
+def get_cache():
+    """
+    Return the cache configured by the `RESPONSE_CACHE_ALIAS` setting.
+    """
+    return caches[api_settings.user_settings.get("RESPONSE_CACHE_ALIAS", "default")]
+
+
+def model_tag(model):
+    return model._meta.concrete_model._meta.label_lower
+
+
+def _set_tag_version(tag):
+    get_cache().set(TAG_VERSION_KEY.format(tag), uuid.uuid4().hex, None)
+
+
+def invalidate_model(model, using=None):
+    """
+    Invalidate every cached response tagged with the model, once the current
+    transaction of the `using` database commits.
+    """
+    transaction.on_commit(
+        functools.partial(_set_tag_version, model_tag(model)), using=using
+    )
+
+
+def _invalidate_sender(sender, using=None, **kwargs):
+    invalidate_model(sender, using)
+
+
+def _invalidate_m2m(sender, instance, model, action, using=None, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    for changed in (type(instance), model):
+        if model_tag(changed) in _registered_tags:
+            invalidate_model(changed, using)
+
+
+def register_model(model):
+    """
+    Invalidate cached responses tagged with the model whenever one of its
+    instances is saved or deleted, or its many-to-many relations change.
+    """
+    tag = model_tag(model)
+    if tag in _registered_tags:
+        return
+
+    _registered_tags.add(tag)
+    dispatch_uid = f"drfexts.cache:{tag}"
+    post_save.connect(_invalidate_sender, sender=model, dispatch_uid=dispatch_uid)
+    post_delete.connect(_invalidate_sender, sender=model, dispatch_uid=dispatch_uid)
+    # Through models may not be created yet, the receiver checks the models
+    m2m_changed.connect(_invalidate_m2m, dispatch_uid="drfexts.cache")
+
+
+def get_tag_versions(tags):
+    """
+    Return the current version token of each tag.
+    """
+    cache = get_cache()
+    keys = {TAG_VERSION_KEY.format(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # A fresh token, never a reused one, so evicted versions can't revive
+        # entries written before the eviction.
+        cache.add(key, uuid.uuid4().hex, None)
+        versions[key] = cache.get(key)
+
+    return tuple(sorted((keys[key], version) for key, version in versions.items()))
+
+
+def get_serializer_models(serializer, models=None):
+    """
+    Collect the models a model serializer reads, following the relations
+    traversed by the sources of its fields and nested serializers.
+    """
+    models = set() if models is None else models
+    model = getattr(getattr(serializer, "Meta", None), "model", None)
+    if model is None:
+        return models
+
+    models.add(model)
+    for field in serializer._readable_fields:
+        target = model
+        for attr in field.source_attrs if field.source != "*" else ():
+            try:
+                model_field = target._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation or model_field.related_model is None:
+                break
+            target = model_field.related_model
+            models.add(target)
+
+        get_serializer_models(getattr(field, "child", field), models)
+
+    return models
+
+
+def _incr(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def record_cache_event(namespace, event):
+    """
+    Count a cache `hit` or `miss` for the namespace and in total.
+    """
+    cache = get_cache()
+    _incr(cache, STATS_KEY.format(namespace, event))
+    _incr(cache, STATS_KEY.format("*", event))
+
+
+def get_cache_stats(namespace="*"):
+    """
+    Return the hit/miss counters of a namespace (all namespaces by default).
+    """
+    cache = get_cache()
+    return {
+        event: cache.get(STATS_KEY.format(namespace, event), 0)
+        for event in ("hit", "miss")
+    }
@@ -0,0 +1,179 @@
+"""
+Response compression negotiated from `Accept-Encoding`.
+
+Enabled by the `RESPONSE_COMPRESSION` key of the REST framework settings.
+`zstd` requires the optional `zstandard` package and is skipped without it.
+"""
+import gzip
+import zlib
+
+from django.utils.cache import patch_vary_headers
+from rest_framework.settings import api_settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+__all__ = [
+    "get_compression_settings",
+    "select_encoding",
+    "compress",
+    "compress_stream",
+    "compress_rendered",
+    "compress_streaming_response",
+]
+
+DEFAULT_COMPRESSION_SETTINGS = {
+    "ENCODINGS": ["gzip"],
+    "MIN_SIZE": 1024,
+    "LEVELS": {"gzip": 6, "zstd": 3},
+}
+
+
+def get_compression_settings():
+    """
+    Return the compression settings, or None if compression is disabled.
+    """
+    user_settings = api_settings.user_settings.get("RESPONSE_COMPRESSION")
+    if not user_settings:
+        return None
+
+    compression_settings = {**DEFAULT_COMPRESSION_SETTINGS, **user_settings}
+    compression_settings["LEVELS"] = {
+        **DEFAULT_COMPRESSION_SETTINGS["LEVELS"],
+        **user_settings.get("LEVELS", {}),
+    }
+    return compression_settings
+
+
+def _parse_accept_encoding(header):
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def select_encoding(request, encodings):
+    """
+    Choose the first of `encodings` the client accepts, or None.
+    """
+    accepted = _parse_accept_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    for encoding in encodings:
+        if encoding == "zstd" and zstandard is None:
+            continue
+
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+
+    return None
+
+
+def compress(content, encoding, level):
+    """
+    Compress a complete payload.
+    """
+    if encoding == "gzip":
+        return gzip.compress(content, compresslevel=level, mtime=0)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(content)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compress_stream(chunks, encoding, level):
+    """
+    Compress an iterable of byte chunks, flushing after every chunk so the
+    client can start decoding before the stream ends.
+    """
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    elif encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        for chunk in chunks:
+            block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            yield compressor.compress(chunk) + compressor.flush(block)
+        yield compressor.flush()
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _mark_encoded(response, encoding):
+    response["Content-Encoding"] = encoding
+    # The encoded body is a different representation of the resource
+    etag = response.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response["ETag"] = f"W/{etag}"
+
+
+def compress_rendered(content, renderer, renderer_context):
+    """
+    Compress the bytes produced by `renderer` for the response in
+    `renderer_context`, updating the response headers accordingly.
+    """
+    compression_settings = get_compression_settings()
+    if not compression_settings or not content:
+        return content
+
+    # Formats compressed by themselves, e.g. zip containers
+    if not getattr(renderer, "compressible", True):
+        return content
+
+    request = renderer_context.get("request")
+    response = renderer_context.get("response")
+    if request is None or response is None or response.has_header("Content-Encoding"):
+        return content
+
+    # e.g. the BrowsableAPIRenderer rendering the JSON for its page
+    if getattr(request, "accepted_renderer", renderer) is not renderer:
+        return content
+
+    if len(content) < compression_settings["MIN_SIZE"]:
+        return content
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    encoding = select_encoding(request, compression_settings["ENCODINGS"])
+    if encoding is None:
+        return content
+
+    _mark_encoded(response, encoding)
+    return compress(content, encoding, compression_settings["LEVELS"][encoding])
+
+
+def compress_streaming_response(response, request):
+    """
+    Compress a `StreamingHttpResponse` in place. `MIN_SIZE` does not apply,
+    as the size of a stream is unknown up front.
+    """
+    compression_settings = get_compression_settings()
+    if not compression_settings or response.has_header("Content-Encoding"):
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    encoding = select_encoding(request, compression_settings["ENCODINGS"])
+    if encoding is None:
+        return response
+
+    _mark_encoded(response, encoding)
+    if response.has_header("Content-Length"):
+        del response["Content-Length"]
+
+    response.streaming_content = compress_stream(
+        response.streaming_content, encoding, compression_settings["LEVELS"][encoding]
+    )
+    return response
@@ -0,0 +1,345 @@
+"""
+Background export jobs and stored export results.
+
+A job is created by the request, produced by a local thread pool into the
+storage configured by the `EXPORT_STORAGE` setting and tracked in the
+response cache (`RESPONSE_CACHE_ALIAS`), which must be shared by the server
+processes for them to see each other's jobs. The process running a job
+refreshes its heartbeat, jobs of a process that died are reported failed.
+
+Export results are files of the same storage, looked up by a fingerprint of
+the export request and the data it reads.
+"""
+import logging
+import posixpath
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+from .cache import get_cache
+
+__all__ = [
+    "PENDING",
+    "RUNNING",
+    "SUCCESS",
+    "FAILURE",
+    "get_export_storage",
+    "create_export_job",
+    "get_export_job",
+    "get_or_create_export_result",
+    "purge_export_results",
+]
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCESS = "success"
+FAILURE = "failure"
+
+JOB_KEY = "drfexts:export_job:{}"
+RESULT_KEY = "drfexts:export_result:{}"
+RESULT_LOCK_KEY = "drfexts:export_result_lock:{}"
+
+_executor = None
+_executor_lock = threading.Lock()
+# Unfinished jobs of this process, by id, and the result locks it holds,
+# both refreshed by the heartbeat
+_jobs = {}
+_result_locks = set()
+_jobs_lock = threading.Lock()
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+
+
+def get_export_storage():
+    """
+    Return the storage of the `EXPORT_STORAGE` setting: a `STORAGES` alias or
+    the dotted path of a storage class. Defaults to the default storage.
+    """
+    storage = api_settings.user_settings.get("EXPORT_STORAGE")
+    if not storage:
+        return default_storage
+
+    if storage in settings.STORAGES:
+        return storages[storage]
+
+    return import_string(storage)()
+
+
+def check_job_cache(cache):
+    """
+    Refuse a cache the job states can't be read back from, and warn about a
+    cache private to the process: other server processes don't see its jobs.
+    """
+    if isinstance(cache, DummyCache):
+        raise ImproperlyConfigured(
+            "Background exports need a cache, `RESPONSE_CACHE_ALIAS` is a dummy cache."
+        )
+
+    if isinstance(cache, LocMemCache):
+        logger.warning(
+            "Background export jobs are stored in a local-memory cache, which "
+            "only the process running them can read. Set `RESPONSE_CACHE_ALIAS` "
+            "to a shared cache when running several server processes."
+        )
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            check_job_cache(get_cache())
+            _executor = ThreadPoolExecutor(
+                max_workers=api_settings.user_settings.get("EXPORT_WORKERS", 2),
+                thread_name_prefix="drfexts-export",
+            )
+        _start_heartbeat()
+        return _executor
+
+
+def _start_heartbeat():
+    global _heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(
+                target=_beat, name="drfexts-export-heartbeat", daemon=True
+            )
+            _heartbeat.start()
+
+
+def _get_heartbeat_interval():
+    return api_settings.user_settings.get("EXPORT_JOB_HEARTBEAT", 30)
+
+
+def _get_stale_timeout():
+    return api_settings.user_settings.get(
+        "EXPORT_JOB_STALE_TIMEOUT", _get_heartbeat_interval() * 10
+    )
+
+
+def _set_job(job):
+    timeout = api_settings.user_settings.get("EXPORT_JOB_TIMEOUT", 24 * 60 * 60)
+    job["heartbeat_at"] = timezone.now().isoformat()
+    get_cache().set(JOB_KEY.format(job["id"]), job, timeout)
+
+
+def _save_job(job):
+    with _jobs_lock:
+        if job["status"] in (PENDING, RUNNING):
+            _jobs[job["id"]] = job
+        else:
+            _jobs.pop(job["id"], None)
+        _set_job(job)
+
+
+def _beat():
+    while True:
+        time.sleep(_get_heartbeat_interval())
+        with _jobs_lock:
+            for job in _jobs.values():
+                try:
+                    _set_job(job)
+                except Exception:
+                    logger.exception("Failed to refresh export job %s", job["id"])
+            for lock_key in _result_locks:
+                try:
+                    get_cache().touch(lock_key, _get_stale_timeout())
+                except Exception:
+                    logger.exception("Failed to refresh export lock %s", lock_key)
+
+
+def get_export_job(job_id):
+    """
+    Return the state of an export job, or None if it is unknown or expired.
+
+    An unfinished job whose heartbeat stopped for `EXPORT_JOB_STALE_TIMEOUT`
+    seconds, its process having exited, is marked failed.
+    """
+    job = get_cache().get(JOB_KEY.format(job_id))
+    if job is None or job["status"] not in (PENDING, RUNNING):
+        return job
+
+    stale_timeout = _get_stale_timeout()
+    heartbeat_at = datetime.fromisoformat(job.get("heartbeat_at") or job["created_at"])
+    if timezone.now() - heartbeat_at > timedelta(seconds=stale_timeout):
+        job = {
+            **job,
+            "status": FAILURE,
+            "error": "Export job was interrupted.",
+            "finished_at": timezone.now().isoformat(),
+        }
+        _save_job(job)
+
+    return job
+
+
+def _get_location(*parts):
+    location = api_settings.user_settings.get("EXPORT_LOCATION", "exports")
+    return posixpath.join(location, *parts)
+
+
+def _run_export_job(job, write_file):
+    job = {**job, "status": RUNNING}
+    _save_job(job)
+    # Kept apart from `job`, which the heartbeat saves until the job is done
+    result = {}
+    file = None
+    try:
+        file = write_file()
+        name = _get_location(job["id"], job["filename"])
+        result["storage_name"] = get_export_storage().save(name, File(file))
+        result["status"] = SUCCESS
+    except Exception as exc:
+        logger.exception("Export job %s failed", job["id"])
+        result["status"] = FAILURE
+        result["error"] = str(exc)
+    finally:
+        if file is not None:
+            file.close()
+        # The connections opened by this worker thread
+        connections.close_all()
+
+    result["finished_at"] = timezone.now().isoformat()
+    _save_job({**job, **result})
+
+
+def create_export_job(user, export_format, filename, write_file):
+    """
+    Schedule `write_file`, which returns the export as a file object, and
+    return the job state.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": PENDING,
+        "user": getattr(user, "pk", None),
+        "format": export_format,
+        "filename": filename,
+        "storage_name": None,
+        "error": None,
+        "created_at": timezone.now().isoformat(),
+        "finished_at": None,
+    }
+    _save_job(job)
+    get_executor().submit(_run_export_job, job, write_file)
+    return job
+
+
+def _save_result(fingerprint, filename, write_file, timeout):
+    name = _get_location("results", fingerprint, filename)
+    storage = get_export_storage()
+    file = write_file()
+    try:
+        # Left behind by an entry that expired
+        if storage.exists(name):
+            storage.delete(name)
+        name = storage.save(name, File(file))
+    finally:
+        file.close()
+
+    get_cache().set(RESULT_KEY.format(fingerprint), name, timeout)
+    return name
+
+
+def get_or_create_export_result(
+    fingerprint, filename, write_file, timeout, poll_interval=0.2
+):
+    """
+    Return the storage name of the export identified by `fingerprint`,
+    calling `write_file` to produce it if it isn't stored yet.
+
+    Only one caller writes a given export, the others wait for it as long as
+    its lock is held. The heartbeat refreshes the lock while it is written,
+    it expires `EXPORT_JOB_STALE_TIMEOUT` seconds after its process exited.
+    """
+    cache = get_cache()
+    result_key = RESULT_KEY.format(fingerprint)
+    lock_key = RESULT_LOCK_KEY.format(fingerprint)
+    while True:
+        name = cache.get(result_key)
+        if name is not None:
+            return name
+
+        if cache.add(lock_key, True, _get_stale_timeout()):
+            break
+
+        time.sleep(poll_interval)
+
+    with _jobs_lock:
+        _result_locks.add(lock_key)
+    _start_heartbeat()
+    try:
+        # Stored between the lookup and taking the lock
+        name = cache.get(result_key)
+        if name is None:
+            name = _save_result(fingerprint, filename, write_file, timeout)
+    finally:
+        with _jobs_lock:
+            _result_locks.discard(lock_key)
+            cache.delete(lock_key)
+
+    return name
+
+
+def purge_export_results(max_age=None):
+    """
+    Delete the stored export results whose cache entry expired, and the ones
+    older than `max_age` seconds if given. Return the number of files deleted.
+
+    Nothing deletes the files otherwise: run it periodically, e.g. from a
+    scheduled task.
+    """
+    storage = get_export_storage()
+    cache = get_cache()
+    root = _get_location("results")
+    try:
+        fingerprints, _ = storage.listdir(root)
+    except FileNotFoundError:
+        return 0
+
+    if max_age is not None:
+        max_age = timezone.now() - timedelta(seconds=max_age)
+
+    deleted = 0
+    for fingerprint in fingerprints:
+        if cache.get(RESULT_LOCK_KEY.format(fingerprint)) is not None:
+            # Being written
+            continue
+
+        result_key = RESULT_KEY.format(fingerprint)
+        current = cache.get(result_key)
+        directory = posixpath.join(root, fingerprint)
+        _, filenames = storage.listdir(directory)
+        kept = 0
+        for filename in filenames:
+            name = posixpath.join(directory, filename)
+            if name == current:
+                if max_age is None or storage.get_modified_time(name) > max_age:
+                    kept += 1
+                    continue
+                cache.delete(result_key)
+
+            storage.delete(name)
+            deleted += 1
+
+        if not kept:
+            try:
+                # Removes the directory of a file system storage
+                storage.delete(directory)
+            except OSError:
+                pass
+
+    return deleted
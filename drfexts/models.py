@@ -1,10 +1,13 @@
 from typing import Any, Dict, List
 
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core.exceptions import FieldDoesNotExist
-from django.db import models
+from django.db import models, router
 from django.db.models import Func, fields
+from django.db.models.signals import class_prepared
 
+from .cache import invalidate_model, register_model
 from .constants import CommonStatus
 from .fields import (
     AuditStatusField,
@@ -47,6 +50,30 @@ class NotNull(Func):
 
 
 class StatusQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        # `update()` bypasses model signals, invalidate cached responses here
+        invalidate_model(self.model, self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        invalidate_model(self.model, self.db)
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        rows = super().bulk_update(objs, *args, **kwargs)
+        invalidate_model(self.model, self.db)
+        return rows
+
+    def delete(self):
+        using = self._db or router.db_for_write(self.model, **self._hints)
+        deleted, rows = super().delete()
+        # Cascades to models without `post_delete` receivers are fast deletes
+        for label in rows:
+            invalidate_model(apps.get_model(label), using)
+        return deleted, rows
+
     def editable(self):
         return self.exclude(status__in=[CommonStatus.DELETED, CommonStatus.INVALID])
 
@@ -59,6 +86,18 @@ class StatusQuerySet(models.QuerySet):
         return self.filter(status=CommonStatus.VALID)
 
 
+def _register_status_model(sender, **kwargs):
+    # Hook deletes of the models of `StatusQuerySet` wherever they are loaded
+    if any(
+        issubclass(getattr(manager, "_queryset_class", models.QuerySet), StatusQuerySet)
+        for manager in sender._meta.managers
+    ):
+        register_model(sender)
+
+
+class_prepared.connect(_register_status_model, dispatch_uid="drfexts.models")
+
+
 class BaseModel(models.Model):
     """
     标准抽象模型模型,可直接继承使用
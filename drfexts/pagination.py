@@ -1,10 +1,64 @@
-from rest_framework.pagination import CursorPagination, PageNumberPagination
-from rest_framework.response import Response
-from django.core.paginator import EmptyPage, PageNotAnInteger
-from rest_framework.exceptions import NotFound
+import hashlib
+import json
 from urllib.parse import urlparse, urlunparse
 
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db import connections
+from django.db.models import QuerySet
 from django.http import QueryDict
+from django.urls import NoReverseMatch
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .cache import get_cache
+
+# 分页总数的计算方式
+EXACT = "exact"  # COUNT(*) 精确计数
+ESTIMATED = "estimated"  # 查询计划器的估计行数
+CACHED = "cached"  # 按过滤条件缓存的精确计数
+DEFERRED = "deferred"  # 不计数，由 count 接口另行获取
+
+COUNT_STRATEGIES = (EXACT, ESTIMATED, CACHED, DEFERRED)
+COUNT_KEY = "drfexts:count:{}"
+
+
+def get_count_key(queryset):
+    """
+    总数的缓存键：由去掉排序、select_related 的计数 SQL 生成，与查询参数的顺序、
+    分页参数无关。查询必然为空时返回 None
+    """
+    try:
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    except EmptyResultSet:
+        return None
+
+    key = repr((queryset.db, sql, params))
+    return COUNT_KEY.format(hashlib.sha1(key.encode()).hexdigest())
+
+
+def estimate_count(queryset):
+    """
+    返回查询计划器估计的行数，数据库不支持时返回 None（目前仅支持 PostgreSQL）
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    try:
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 
 class CustomPagination(PageNumberPagination):
@@ -20,12 +74,139 @@ class CustomPagination(PageNumberPagination):
     # 设置页码的查询参数名称
     page_query_param = "page"
 
+    # 总数的计算方式，见 COUNT_STRATEGIES，默认取 PAGINATION_COUNT_STRATEGY 配置
+    count_strategy = None
+
+    # 缓存总数的秒数，默认取 PAGINATION_COUNT_CACHE_TIMEOUT 配置
+    count_cache_timeout = None
+
+    # 估计行数低于该值时改为精确计数（小表的估计值误差较大）
+    count_estimate_threshold = 10000
+
+    def get_count_strategy(self, request, view=None):
+        """
+        返回总数的计算方式
+        """
+        strategy = self.count_strategy or api_settings.user_settings.get(
+            "PAGINATION_COUNT_STRATEGY", EXACT
+        )
+        assert strategy in COUNT_STRATEGIES, f"Unknown count strategy: {strategy}"
+        return strategy
+
+    def get_count_cache_timeout(self):
+        if self.count_cache_timeout is not None:
+            return self.count_cache_timeout
+
+        return api_settings.user_settings.get("PAGINATION_COUNT_CACHE_TIMEOUT", 60)
+
+    def get_exact_count(self, queryset):
+        """
+        精确计数并按过滤条件缓存
+        """
+        key = get_count_key(queryset)
+        if key is None:
+            return 0
+
+        total = queryset.count()
+        get_cache().set(key, total, self.get_count_cache_timeout())
+        return total
+
+    def get_count(self, queryset, strategy):
+        """
+        按计算方式返回总数及其类型，延后计数且没有缓存时总数为 None
+        """
+        if strategy == ESTIMATED:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate >= self.count_estimate_threshold:
+                return estimate, ESTIMATED
+
+            return queryset.count(), EXACT
+
+        key = get_count_key(queryset)
+        if key is None:
+            return 0, EXACT
+
+        total = get_cache().get(key)
+        if total is not None:
+            return total, CACHED
+
+        if strategy == DEFERRED:
+            return None, DEFERRED
+
+        return self.get_exact_count(queryset), EXACT
+
+    def get_count_url(self, request, view):
+        """
+        返回获取精确总数的 count 接口地址（需视图集使用 PaginationCountMixin）
+        """
+        try:
+            url = view.reverse_action("count")
+        except (AttributeError, NoReverseMatch):
+            return None
+
+        query_params = request.query_params.copy()
+        for param in (self.page_query_param, self.page_size_query_param):
+            query_params.pop(param, None)
+        if not query_params:
+            return url
+
+        return f"{url}?{query_params.urlencode()}"
+
+    def paginate_without_count(self, queryset, request, strategy, view=None):
+        """
+        不执行 COUNT(*) 的分页：多取一行判断是否有下一页，最后一页的总数可直接得出，
+        其余页按 strategy 取总数
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            # 最后一页的页码需要精确总数
+            return super().paginate_queryset(queryset, request, view)
+
+        try:
+            number = int(page_number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+
+        bottom = (number - 1) * page_size
+        top = bottom + page_size + 1
+        rows = list(queryset[bottom:top])
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+
+        if len(rows) <= page_size:
+            total, self.total_type = bottom + len(rows), EXACT
+        else:
+            rows.pop()
+            total, self.total_type = self.get_count(queryset, strategy)
+            if self.total_type == DEFERRED:
+                self.count_url = self.get_count_url(request, view)
+
+        # 估计值可能小于已读到的行数；延后计数时 paginator 只记录已知的行数下限
+        paginator.count = max(total or 0, top)
+        if self.total_type == EXACT:
+            paginator.count = total
+
+        self.page = paginator.page(number)
+        self.page.object_list = rows
+        self.request = request
+        return rows
+
     def paginate_queryset(self, queryset, request, view=None):
         """
         重写分页查询方法，支持page=all参数
         """
         # 获取page参数的值
         page_param = request.query_params.get(self.page_query_param)
+        self.strategy = self.get_count_strategy(request, view)
+        self.total_type = EXACT
+        self.count_url = None
 
         if page_param == "all":
             # 如果page=all，返回所有数据，不进行分页
@@ -34,52 +215,105 @@ class CustomPagination(PageNumberPagination):
             return list(queryset)
 
         try:
+            if self.strategy != EXACT and isinstance(queryset, QuerySet):
+                return self.paginate_without_count(
+                    queryset, request, self.strategy, view
+                )
+
             # 尝试执行默认的分页逻辑
             return super().paginate_queryset(queryset, request, view)
-        except (NotFound, EmptyPage, PageNotAnInteger):
-            # 如果页码超出范围或无效，返回空列表
-            self.page = None
-            self.request = request
-            self._empty_page = True  # 标记这是一个空页面
-            return []
+        except NotFound as exc:
+            return self.paginate_invalid_page(request, exc)
+        except (EmptyPage, PageNotAnInteger) as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_param, message=str(exc)
+            )
+            return self.paginate_invalid_page(request, NotFound(msg))
+
+    def paginate_invalid_page(self, request, exc):
+        """
+        页码超出范围或无效时与 DRF 一致返回 404
+        """
+        raise exc
 
     def get_paginated_response(self, data):
         """
         重写分页响应方法，返回自定义格式
         """
+        if self.page is None:
+            # page=all 时没有分页信息
+            return Response({**self.get_stream_extra(len(data)), "results": data})
+
+        paginator = self.page.paginator
+        response = {"total": None if self.total_type == DEFERRED else paginator.count}
+        # 默认的精确计数保持原有的响应格式
+        if self.strategy != EXACT:
+            response["total_type"] = self.total_type
+        if self.total_type == DEFERRED:
+            # 总数由 count 接口另行获取
+            response["count_url"] = self.count_url
+
         return Response(
             {
-                "total": self.page.paginator.count,
-                "page_size": self.page.paginator.per_page,
+                **response,
+                "page_size": paginator.per_page,
                 "current_page": self.page.number,
                 "results": data,
             }
         )
 
+    def get_stream_extra(self, total):
+        """
+        page=all 流式响应中跟在 results 之后的分页字段
+        """
+        extra = {"total": total, "page_size": total, "current_page": 1}
+        if self.get_count_strategy(getattr(self, "request", None)) != EXACT:
+            extra["total_type"] = EXACT
+        return extra
+
     def get_paginated_response_schema(self, schema):
-        return {
-            "type": "object",
-            "properties": {
-                "total": {
-                    "type": "integer",
-                    "example": 123,
-                },
-                "page_size": {
-                    "type": "integer",
-                    "example": 15,
-                },
-                "current_page": {
-                    "type": "integer",
-                    "example": 1,
-                },
-                "results": schema,
+        properties = {
+            "total": {
+                "type": "integer",
+                "example": 123,
             },
+            "page_size": {
+                "type": "integer",
+                "example": 15,
+            },
+            "current_page": {
+                "type": "integer",
+                "example": 1,
+            },
+            "results": schema,
         }
+        if self.get_count_strategy(getattr(self, "request", None)) != EXACT:
+            properties["total"]["nullable"] = True
+            properties["total_type"] = {
+                "type": "string",
+                "enum": list(COUNT_STRATEGIES),
+                "example": EXACT,
+            }
+            properties["count_url"] = {
+                "type": "string",
+                "nullable": True,
+                "example": "http://api.example.org/accounts/count/?status=50",
+            }
+
+        return {"type": "object", "properties": properties}
 
 
 class WithoutCountPagination(CustomPagination):
     has_next: bool = True
 
+    def paginate_invalid_page(self, request, exc):
+        """
+        页码超出范围或无效时返回空列表，previous和next为空字符串
+        """
+        self.page = None
+        self.request = request
+        return []
+
     def get_previous_link(self):
         """
         获取上一页链接，如果没有上一页返回None
@@ -149,6 +383,12 @@ class WithoutCountPagination(CustomPagination):
             }
         )
 
+    def get_stream_extra(self, total):
+        """
+        page=all 流式响应中跟在 results 之后的分页字段
+        """
+        return {"previous": "", "next": ""}
+
     def get_paginated_response_schema(self, schema):
         return {
             "type": "object",
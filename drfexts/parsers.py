@@ -1,21 +1,170 @@
 import codecs
+import csv
+import io
+import mmap
+import re
+import shutil
+import tempfile
+from contextlib import ExitStack, closing, contextmanager
 from typing import Any, Optional
 
 import orjson
-import unicodecsv as csv
 from django.conf import settings
-from openpyxl import load_workbook
 from rest_framework.parsers import BaseParser, ParseError
+from rest_framework.settings import api_settings
 
-__all__ = ["CustomJSONParser", "CustomXLSXParser", "CustomCSVParser"]
+from .utils import chunked
+from .xlsx import XLSXReader
+
+try:
+    import ormsgpack
+except ImportError:  # pragma: no cover
+    ormsgpack = None
+
+__all__ = [
+    "RowLimitExceeded",
+    "BaseTableParser",
+    "CustomJSONParser",
+    "CustomMessagePackParser",
+    "CustomXLSXParser",
+    "CustomCSVParser",
+]
+
+
+class RowLimitExceeded(ParseError):
+    """
+    Raised when an upload has more rows than allowed.
+    """
+
+
+JSON_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# A string literal, a string continuing in the next block, or a structural
+# character of a JSON document
+JSON_TOKEN_RE = re.compile(rb'%s|"|[\[\]{},]' % JSON_STRING)
+
+
+def _json_container(depth):
+    """
+    Pattern of an array or object nesting at most `depth` levels.
+    """
+    pattern = b""
+    for level in range(depth):
+        # Runs of plain characters are matched atomically (a lookahead and
+        # a backreference), so that a failed match doesn't backtrack into them
+        run = rb"(?=(?P<run%d>[^\"\[\]{}]+))(?P=run%d)" % (level, level)
+        pattern = rb"[\[{](?:%s|%s%s)*[\]}]" % (
+            run,
+            JSON_STRING,
+            b"|" + pattern if pattern else b"",
+        )
+    return pattern
+
+
+# An array element followed by its separator, matched in one go unless it
+# nests more than six levels deep
+JSON_ELEMENT_RE = re.compile(
+    rb'\s*(?:%s|%s|[^"\[\]{},\s]+)\s*(?P<separator>[,\]}])'
+    % (JSON_STRING, _json_container(6))
+)
+
+
+def _find_array_element(buffer, position):
+    """
+    Return the span of the separator following the array element at
+    `position`, or None if the element does not end within the buffer.
+    """
+    match = JSON_ELEMENT_RE.match(buffer, position)
+    if match is not None:
+        return match.span("separator")
+
+    depth = 0
+    for match in JSON_TOKEN_RE.finditer(buffer, position):
+        token = match.group()
+        if token == b'"':
+            return None
+        if token[:1] == b'"':
+            continue
+        if token in b"[{":
+            depth += 1
+        elif depth and token in b"]}":
+            depth -= 1
+        elif not depth:
+            return match.span()
+
+    return None
+
+
+def is_utf8(encoding):
+    try:
+        return codecs.lookup(encoding).name == "utf-8"
+    except LookupError:
+        return False
+
+
+class StreamReader(io.RawIOBase):
+    """
+    A raw binary file reading from a request stream, for `io` wrappers.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class MappedFile(io.RawIOBase):
+    """
+    A seekable binary file reading from a memory map, for `zipfile`.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.data.seek(offset, whence)
+        return self.data.tell()
+
+    def tell(self):
+        return self.data.tell()
+
+    def read(self, size=-1):
+        return self.data.read(size)
+
+    def readinto(self, buffer):
+        data = self.data.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
 
 
 class CustomJSONParser(BaseParser):
     """
     Parses JSON-serialized data by orjson parser.
+
+    UTF-8 bodies are handed to orjson as bytes, without being decoded first.
+    With `parser_context["batches"]` a top-level array is parsed
+    incrementally: `parse` returns an iterator of lists of `batch_size`
+    elements, read from the stream as they are consumed.
     """
 
     media_type: str = "application/json"
+    # Elements per batch of the incremental mode
+    batch_size = 1000
+    # Bytes read from the stream at once by the incremental mode
+    block_size = 64 * 1024
+    # Reject larger bodies, None for the `JSON_MAX_BODY_SIZE` setting
+    max_body_size = None
 
     def parse(
         self,
@@ -37,81 +186,366 @@ class CustomJSONParser(BaseParser):
         """
         parser_context = parser_context or {}
         encoding: str = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        max_body_size = self.get_max_body_size(parser_context)
+        if parser_context.get("batches"):
+            batch_size = parser_context.get("batch_size", self.batch_size)
+            blocks = self.iter_blocks(stream, encoding, max_body_size)
+            return self.parse_array(blocks, batch_size)
 
         try:
+            if is_utf8(encoding):
+                return orjson.loads(self.read(stream, max_body_size))
+
             decoded_stream = codecs.getreader(encoding)(stream)
-            return orjson.loads(decoded_stream.read())
+            return orjson.loads(decoded_stream.read(self.get_read_size(max_body_size)))
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+    def get_max_body_size(self, parser_context):
+        max_body_size = parser_context.get("max_body_size", self.max_body_size)
+        if max_body_size is None:
+            max_body_size = api_settings.user_settings.get("JSON_MAX_BODY_SIZE")
+
+        request = parser_context.get("request")
+        content_length = request.META.get("CONTENT_LENGTH") if request else None
+        if max_body_size is not None and content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                content_length = 0
+            self.check_body_size(content_length, max_body_size)
+
+        return max_body_size
+
+    def get_read_size(self, max_body_size):
+        # One more byte than allowed, to tell a body at the limit from a larger one
+        return -1 if max_body_size is None else max_body_size + 1
+
+    def check_body_size(self, size, max_body_size):
+        if max_body_size is not None and size > max_body_size:
+            raise ParseError(
+                f"JSON parse error - request body exceeds {max_body_size} bytes"
+            )
+
+    def read(self, stream, max_body_size):
+        if stream is None:
+            return b""
+
+        content = stream.read(self.get_read_size(max_body_size))
+        self.check_body_size(len(content), max_body_size)
+        return content
+
+    def iter_blocks(self, stream, encoding, max_body_size):
+        """
+        Yield the body as UTF-8 bytes, `block_size` bytes of the stream at
+        a time.
+        """
+        if stream is None:
+            return
+
+        decoder = None
+        if not is_utf8(encoding):
+            decoder = codecs.getincrementaldecoder(encoding)()
+
+        size = 0
+        while block := stream.read(self.block_size):
+            size += len(block)
+            self.check_body_size(size, max_body_size)
+            if decoder is not None:
+                block = decoder.decode(block).encode()
+            yield block
+
+        if decoder is not None:
+            yield decoder.decode(b"", final=True).encode()
+
+    def parse_array(self, blocks, batch_size):
+        """
+        Yield the elements of the top-level array of the JSON document in
+        `blocks`, `batch_size` at a time.
+
+        The elements are delimited by scanning the document, each batch is
+        then parsed by orjson at once.
+        """
+        blocks = iter(blocks)
+        buffer = b""
+        try:
+            while not buffer:
+                block = next(blocks, None)
+                if block is None:
+                    raise ValueError("a top-level array is expected")
+                buffer = block.lstrip()
+
+            if buffer[:1] != b"[":
+                raise ValueError("a top-level array is expected")
+
+            position = 1
+            items = []
+            separated = exhausted = False
+            while True:
+                separator = _find_array_element(buffer, position)
+                if separator is None:
+                    if exhausted:
+                        raise ValueError("unexpected end of the array")
+                    # Read at least as much again as the unfinished element,
+                    # so that a large one isn't scanned once per block
+                    parts = [buffer[position:]]
+                    size = len(parts[0])
+                    wanted = 2 * size + 1
+                    while size < wanted:
+                        block = next(blocks, None)
+                        if block is None:
+                            exhausted = True
+                            break
+                        parts.append(block)
+                        size += len(block)
+                    buffer = b"".join(parts)
+                    position = 0
+                    continue
+
+                start, end = separator
+                item = buffer[position:start]
+                token = buffer[start:end]
+                position = end
+                if token == b",":
+                    items.append(item)
+                    separated = True
+                    if len(items) >= batch_size:
+                        yield orjson.loads(b"[%s]" % b",".join(items))
+                        items = []
+                    continue
+
+                if token != b"]":
+                    raise ValueError("unbalanced brackets")
+                # Nothing between the brackets of an empty array
+                if separated or item.strip():
+                    items.append(item)
+                break
+
+            if items:
+                yield orjson.loads(b"[%s]" % b",".join(items))
+
+            if buffer[position:].strip() or any(block.strip() for block in blocks):
+                raise ValueError("unexpected content after the array")
         except ValueError as exc:
             raise ParseError("JSON parse error - %s" % str(exc))
 
 
-class CustomXLSXParser(BaseParser):
+class CustomMessagePackParser(BaseParser):
+    """
+    Parses MessagePack-serialized data by ormsgpack parser.
+    """
+
+    media_type: str = "application/msgpack"
+
+    def parse(
+        self,
+        stream,
+        media_type: Optional[str] = None,
+        parser_context: Any = None,
+    ) -> Any:
+        """
+        De-serializes MessagePack bytes to Python objects.
+        """
+        assert ormsgpack is not None, "CustomMessagePackParser requires ormsgpack"
+        try:
+            return ormsgpack.unpackb(stream.read(), option=ormsgpack.OPT_NON_STR_KEYS)
+        except (ValueError, ormsgpack.MsgpackDecodeError) as exc:
+            raise ParseError("MessagePack parse error - %s" % str(exc))
+
+
+class BaseTableParser(BaseParser):
+    """
+    Base parser for tabular uploads whose first row is the header.
+
+    `parse` returns a list of dicts. With `parser_context["batches"]` it
+    returns an iterator of lists of `batch_size` dicts instead, read from the
+    upload as they are consumed, so memory does not grow with the upload.
+    With `parser_context["columns"]`, a collection of headers, the other
+    columns are left out. With `max_rows`, the rows are counted before the
+    first batch is returned, the upload being spooled to a temporary file if
+    it can't be read twice.
+    """
+
+    error_prefix = "Table"
+    # Rows per batch
+    batch_size = 1000
+    # Reject uploads with more data rows, None for no limit
+    max_rows = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        batches = self.parse_batches(stream, media_type, parser_context)
+        if parser_context.get("batches"):
+            return batches
+
+        return [item for batch in batches for item in batch]
+
+    def parse_batches(self, stream, media_type=None, parser_context=None):
+        """
+        Yield the rows of the upload as dicts, `batch_size` at a time.
+        Raises `RowLimitExceeded` before the first batch if the upload has
+        more than `max_rows` rows.
+        """
+        parser_context = parser_context or {}
+        batch_size = parser_context.get("batch_size", self.batch_size)
+        max_rows = parser_context.get("max_rows", self.max_rows)
+        with ExitStack() as stack:
+            try:
+                if max_rows is not None and stream is not None:
+                    stream = self.rewindable(stream, stack)
+                    start = stream.tell()
+                    if self.count_rows(stream, parser_context) > max_rows:
+                        raise RowLimitExceeded(
+                            f"{self.error_prefix} parse error - "
+                            f"more than {max_rows} rows"
+                        )
+                    stream.seek(start)
+
+                rows = stack.enter_context(
+                    closing(self.iter_rows(stream, parser_context))
+                )
+                headers = self.get_headers(next(rows, None) or [])
+                for batch in chunked(rows, batch_size):
+                    yield [dict(zip(headers, row)) for row in batch]
+            except ParseError:
+                raise
+            except Exception as exc:
+                raise ParseError(f"{self.error_prefix} parse error - {exc}")
+
+    def rewindable(self, stream, stack):
+        """
+        Return the stream if it is seekable, or a temporary copy of it closed
+        with `stack`.
+        """
+        seekable = getattr(stream, "seekable", None)
+        if seekable is not None and seekable():
+            return stream
+
+        file = stack.enter_context(
+            tempfile.SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        )
+        shutil.copyfileobj(stream, file)
+        file.seek(0)
+        return file
+
+    def count_rows(self, stream, parser_context):
+        """
+        Count the data rows of the upload, without converting any cell.
+        """
+        with closing(self.iter_rows(stream, {**parser_context, "columns": ()})) as rows:
+            return max(sum(1 for _ in rows) - 1, 0)
+
+    def get_headers(self, row):
+        return list(row)
+
+    def get_column_indexes(self, header, parser_context):
+        """
+        Return the indexes of the columns to read given the header row.
+        """
+        columns = parser_context.get("columns")
+        if columns is None:
+            return range(len(header))
+
+        headers = self.get_headers(header)
+        return [index for index, name in enumerate(headers) if name in columns]
+
+    def iter_rows(self, stream, parser_context):
+        """
+        Yield the rows of the upload as sequences of values, restricted to
+        `get_column_indexes`.
+        """
+        raise NotImplementedError
+
+
+class CustomXLSXParser(BaseTableParser):
     """
     Parses data frame from Excel (.xlsx)
+
+    Reads the sheet of `parser_context["sheet"]`, a name or an index, the
+    active one by default. Cells of the columns left out by
+    `parser_context["columns"]` are never converted.
     """
 
     media_type: str = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    error_prefix = "Excel"
+    # Bytes copied at once from the upload to the temporary file
+    block_size = 64 * 1024
 
-    def parse(self, stream, media_type=None, parser_context=None):
+    def get_headers(self, row):
+        return [str(h).strip() for h in row]
+
+    @contextmanager
+    def open_upload(self, stream):
         """
-        Simply return a string representing the body of the request.
+        Map the upload in memory, as xlsx files must be seekable. Uploads not
+        stored in a file already are copied to a temporary file first.
         """
         try:
-            workbook = load_workbook(stream._stream, read_only=True)
-            sheet = workbook.active
-            data = []
-            headers = None
-            for i, row in enumerate(sheet.iter_rows(values_only=True)):
-                if i == 0:
-                    headers = [str(h).strip() for h in row]
-                    continue
-                # 构造每一行的字典
-                row_dict = dict(zip(headers, row))
-                data.append(row_dict)
+            data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            data = None
+
+        if data is not None:
+            with data:
+                yield data
+            return
+
+        with tempfile.TemporaryFile() as file:
+            shutil.copyfileobj(stream, file, self.block_size)
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def iter_rows(self, stream, parser_context):
+        if stream is None:
+            return
 
-            return data
-        except Exception as exc:
-            raise ParseError("Excel parse error - %s" % str(exc))
-        finally:
-            workbook.close()
+        with self.open_upload(stream) as data:
+            reader = XLSXReader(MappedFile(data))
+            try:
+                yield from reader.iter_rows(
+                    parser_context.get("sheet"),
+                    lambda header: self.get_column_indexes(header, parser_context),
+                )
+            finally:
+                reader.close()
 
 
-class CustomCSVParser(BaseParser):
+class CustomCSVParser(BaseTableParser):
     """
     Parses data frame from CSV (.csv)
     """
 
     media_type: str = "text/csv"
+    error_prefix = "CSV"
+    # Bytes read from the upload at once
+    block_size = 64 * 1024
+
+    def iter_rows(self, stream, parser_context):
+        if stream is None:
+            return
 
-    def parse(self, stream, media_type=None, parser_context=None):
-        parser_context = parser_context or {}
         delimiter = parser_context.get("delimiter", ",")
         encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        rows = csv.reader(self.iter_lines(stream, encoding), delimiter=delimiter)
+        header = next(rows, None)
+        if header is None:
+            return
 
-        try:
-            strdata = stream.read()
-            binary = self.universal_newlines(strdata)
-            rows = self.unicode_csv_reader(binary, delimiter=delimiter, charset=encoding)
-            data = []
-            headers = next(rows)
-            for row in rows:
-                row_data = dict(zip(headers, row))
-                data.append(row_data)
-            return data
-        except Exception as exc:
-            raise ParseError("CSV parse error - %s" % str(exc))
-
-    def unicode_csv_reader(self, csv_data, dialect=csv.excel, charset="utf-8", **kwargs):
-        csv_reader = csv.reader(csv_data, dialect=dialect, encoding=charset, **kwargs)
-        for row in csv_reader:
-            yield row
-
-    def universal_newlines(self, stream):
-        # It's possible that the stream was not opened in universal
-        # newline mode. If not, we may have a single "row" that has a
-        # bunch of carriage return (\r) characters that should act as
-        # newlines. For that case, lets call splitlines on the row. If
-        # it doesn't have any newlines, it will return a list of just
-        # the row itself.
-        for line in stream.splitlines():
-            yield line
+        indexes = self.get_column_indexes(header, parser_context)
+        yield [header[index] for index in indexes]
+        if parser_context.get("columns") is None:
+            yield from rows
+            return
+
+        for row in rows:
+            yield [row[index] if index < len(row) else None for index in indexes]
+
+    def iter_lines(self, stream, encoding):
+        """
+        Decode the stream into lines, keeping their line breaks so that
+        quoted values may span lines. Like universal newlines, a lone
+        carriage return ends a line too.
+        """
+        buffer = io.BufferedReader(StreamReader(stream), self.block_size)
+        return io.TextIOWrapper(buffer, encoding=encoding, newline="")
@@ -1,28 +1,163 @@
+import codecs
+import csv
 import datetime
 import functools
 import operator
+import shutil
+import tempfile
 from decimal import Decimal
-from io import BytesIO
+from io import BytesIO, StringIO
 from itertools import chain
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 from urllib.parse import quote
 
 import orjson
-import unicodecsv as csv
 from django.db.models.query import QuerySet
 from django.utils.encoding import force_str
 from django.utils.functional import Promise
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font, PatternFill
-from rest_framework import status
+from rest_framework import ISO_8601, status
 from rest_framework.renderers import BaseRenderer
 from rest_framework.settings import api_settings
 from rest_framework.status import is_success
 
-__all__ = ["CustomJSONRenderer", "CustomCSVRenderer", "CustomXLSXRenderer"]
+from .compression import compress_rendered
+from .serializers.arrow import RecordBatchStream
+from .serializers.mixins import RowBatch
+from .utils import chunked
+from .xlsx import MAX_SHEET_ROWS, XLSXWriter
 
+try:
+    import ormsgpack
+except ImportError:  # pragma: no cover
+    ormsgpack = None
 
-class CustomJSONRenderer(BaseRenderer):
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+__all__ = [
+    "CustomJSONRenderer",
+    "CustomMessagePackRenderer",
+    "CustomCSVRenderer",
+    "CustomXLSXRenderer",
+    "CustomNDJSONRenderer",
+    "CustomArrowRenderer",
+    "CustomParquetRenderer",
+]
+
+
+def is_iso_format(output_format: Optional[str]) -> bool:
+    return output_format is None or output_format.lower() == ISO_8601
+
+
+@functools.lru_cache(maxsize=None)
+def get_temporal_formatter(output_format: Optional[str]) -> Callable[[Any], str]:
+    """
+    Return the function formatting date/time values like the serializer
+    fields do for the given `*_FORMAT` setting.
+    """
+    if not is_iso_format(output_format):
+        return operator.methodcaller("strftime", output_format)
+
+    def formatter(value):
+        value = value.isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return formatter
+
+
+def uses_iso_formats() -> bool:
+    """
+    Return True if `DATETIME_FORMAT`, `DATE_FORMAT` and `TIME_FORMAT` are all
+    ISO 8601, the format the serialization libraries produce natively.
+    """
+    formats = (
+        api_settings.DATETIME_FORMAT,
+        api_settings.DATE_FORMAT,
+        api_settings.TIME_FORMAT,
+    )
+    return all(is_iso_format(output_format) for output_format in formats)
+
+
+def encode_datetime(value: datetime.datetime) -> str:
+    return get_temporal_formatter(api_settings.DATETIME_FORMAT)(value)
+
+
+def encode_date(value: datetime.date) -> str:
+    return get_temporal_formatter(api_settings.DATE_FORMAT)(value)
+
+
+def encode_time(value: datetime.time) -> str:
+    return get_temporal_formatter(api_settings.TIME_FORMAT)(value)
+
+
+def encode_decimal(value: Decimal) -> Any:
+    if api_settings.COERCE_DECIMAL_TO_STRING:
+        return str(value)
+    return float(value)
+
+
+class ResponseEnvelopeMixin:
+    """
+    Wrap response data into the `{request_id, ret, msg, data}` envelope
+    shared by the API renderers.
+    """
+
+    def get_envelope(self, renderer_context: Any, status_code: int) -> Dict[str, Any]:
+        """
+        Return the envelope keys preceding `data`.
+        """
+        envelope = {}
+        if hasattr(renderer_context.get("request"), "id"):
+            envelope["request_id"] = renderer_context["request"].id
+
+        envelope["ret"] = status_code
+        envelope["msg"] = "success"
+        return envelope
+
+    def get_payload(self, data: Any, renderer_context: Any) -> Any:
+        """
+        Wrap the response data into the envelope, flattening error details
+        into `msg`.
+
+        :param data: The response data, as set by the Response() instantiation.
+        :param renderer_context: Dictionary of contextual information provided
+                by the view.
+        :return: the payload to be serialized
+        """
+        response = renderer_context["response"]
+        payload = self.get_envelope(renderer_context, response.status_code)
+
+        if data is not None:
+            payload["data"] = data
+
+        if not is_success(response.status_code):
+            try:
+                payload["msg"] = data["detail"]
+                payload.pop("data", None)
+            except KeyError:
+                payload["msg"] = "Invalid input."
+            except TypeError:
+                data = data[0]
+                try:
+                    payload["msg"] = data["detail"]
+                except (KeyError, TypeError):
+                    payload["msg"] = str(data)
+
+                payload.pop("data", None)
+
+        response.status_code = status.HTTP_200_OK  # Set all response status to HTTP 200
+        return payload
+
+
+class CustomJSONRenderer(ResponseEnvelopeMixin, BaseRenderer):
     """
     Renderer which serializes to JSON.
     Uses the Rust-backed orjson library for serialization speed.
@@ -36,11 +171,65 @@ class CustomJSONRenderer(BaseRenderer):
     options = functools.reduce(
         operator.or_,
         api_settings.user_settings.get("ORJSON_RENDERER_OPTIONS", ()),
-        orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME,
+        orjson.OPT_SERIALIZE_NUMPY,
     )
 
-    @staticmethod
-    def default(obj: Any) -> Any:
+    # Encoders of the types orjson doesn't serialize natively, keyed by exact
+    # type. Subclasses fall back to the encoder of their closest base class.
+    encoders: Dict[type, Callable[[Any], Any]] = {
+        Promise: force_str,
+        datetime.datetime: encode_datetime,
+        datetime.date: encode_date,
+        datetime.time: encode_time,
+        Decimal: encode_decimal,
+        QuerySet: tuple,
+    }
+    _resolved_encoders: Dict[type, Callable[[Any], Any]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The encoders of a subclass may differ, so it resolves types on its own
+        cls._resolved_encoders = {}
+
+    @classmethod
+    def get_options(cls) -> int:
+        """
+        Return the orjson options. Datetimes, dates and times are only
+        formatted natively by orjson when `DATETIME_FORMAT`, `DATE_FORMAT` and
+        `TIME_FORMAT` are all ISO 8601, and passed through to `default`
+        otherwise.
+        """
+        if uses_iso_formats():
+            return cls.options | orjson.OPT_UTC_Z
+        return cls.options | orjson.OPT_PASSTHROUGH_DATETIME
+
+    @classmethod
+    def register_encoder(cls, type_: type, encoder: Callable[[Any], Any]) -> None:
+        """
+        Register the encoder of a type orjson doesn't serialize natively.
+        """
+        if "encoders" not in cls.__dict__:
+            cls.encoders = dict(cls.encoders)
+        cls.encoders[type_] = encoder
+        cls._resolved_encoders = {}
+
+    @classmethod
+    def resolve_encoder(cls, type_: type) -> Callable[[Any], Any]:
+        """
+        Find the encoder of a type without a registered encoder of its own.
+        """
+        for base in type_.__mro__:
+            if base in cls.encoders:
+                return cls.encoders[base]
+
+        if hasattr(type_, "tolist"):
+            return operator.methodcaller("tolist")
+        if hasattr(type_, "__iter__"):
+            return list
+        return lambda obj: None
+
+    @classmethod
+    def default(cls, obj: Any) -> Any:
         """
         When orjson doesn't recognize an object type for serialization it passes
         that object to this function which then converts the object to its
@@ -49,22 +238,11 @@ class CustomJSONRenderer(BaseRenderer):
         :param obj: Object of any type to be converted.
         :return: native python object
         """
-
-        if isinstance(obj, Promise):
-            return force_str(obj)
-        elif isinstance(obj, datetime.datetime):
-            return obj.strftime(api_settings.DATETIME_FORMAT)
-        elif isinstance(obj, Decimal):
-            if api_settings.COERCE_DECIMAL_TO_STRING:
-                return str(obj)
-            else:
-                return float(obj)
-        elif isinstance(obj, QuerySet):
-            return tuple(obj)
-        elif hasattr(obj, "tolist"):
-            return obj.tolist()
-        elif hasattr(obj, "__iter__"):
-            return list(item for item in obj)
+        try:
+            encoder = cls._resolved_encoders[type(obj)]
+        except KeyError:
+            encoder = cls._resolved_encoders[type(obj)] = cls.resolve_encoder(type(obj))
+        return encoder(obj)
 
     def render(
         self,
@@ -83,35 +261,9 @@ class CustomJSONRenderer(BaseRenderer):
                 the following keys: view, request, response, args, kwargs
         :return: bytes() representation of the data encoded to UTF-8
         """
-        if response := renderer_context.get("response"):
-            payload = {}
-            if hasattr(renderer_context.get("request"), "id"):
-                payload["request_id"] = renderer_context["request"].id
-
-            payload["ret"] = response.status_code
-            payload["msg"] = "success"
-
-            if data is not None:
-                payload["data"] = data
-
-            if not is_success(response.status_code):
-                try:
-                    payload["msg"] = data["detail"]
-                    payload.pop("data", None)
-                except KeyError:
-                    payload["msg"] = "Invalid input."
-                except TypeError:
-                    data = data[0]
-                    try:
-                        payload["msg"] = data["detail"]
-                    except (KeyError, TypeError):
-                        payload["msg"] = str(data)
-
-                    payload.pop("data", None)
-
-            response.status_code = (
-                status.HTTP_200_OK
-            )  # Set all response status to HTTP 200
+        renderer_context = renderer_context or {}
+        if renderer_context.get("response"):
+            payload = self.get_payload(data, renderer_context)
         elif data is None:
             return b""
         else:
@@ -119,17 +271,128 @@ class CustomJSONRenderer(BaseRenderer):
 
         # If `indent` is provided in the context, then pretty print the result.
         # E.g. If we're being called by RestFramework's BrowsableAPIRenderer.
-        options = self.options
+        options = self.get_options()
         if media_type == self.html_media_type:
             options |= orjson.OPT_INDENT_2
 
         serialized: bytes = orjson.dumps(payload, default=self.default, option=options)
-        return serialized
+        return compress_rendered(serialized, self, renderer_context)
+
+    def render_stream(
+        self,
+        chunks: Iterable[List[Any]],
+        extra: Optional[Callable[[int], Dict[str, Any]]] = None,
+        renderer_context: Any = None,
+    ) -> Iterator[bytes]:
+        """
+        Serializes a list response chunk by chunk.
+
+        The produced document is the same envelope `render` builds for a
+        successful paginated response, with the rows placed under
+        `data.results`. Only one chunk is held in memory at a time.
+
+        :param chunks: Iterable yielding lists of already serialized rows.
+        :param extra: Optional callable receiving the number of rendered rows
+                and returning the keys appended to `data` after `results`.
+        :param renderer_context: Dictionary of contextual information provided
+                by the view.
+        :return: iterator over the UTF-8 encoded JSON document
+        """
+        renderer_context = renderer_context or {}
+        head = self.get_envelope(renderer_context, status.HTTP_200_OK)
+        yield orjson.dumps(head)[:-1] + b',"data":{"results":['
+
+        options = self.get_options()
+        total = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+
+            serialized = orjson.dumps(chunk, default=self.default, option=options)
+            yield (b"," if total else b"") + serialized[1:-1]
+            total += len(chunk)
+
+        tail = extra(total) if extra else None
+        if tail:
+            tail = orjson.dumps(tail, default=self.default, option=options)
+            yield b"]," + tail[1:-1] + b"}}"
+        else:
+            yield b"]}}"
+
+
+class CustomMessagePackRenderer(ResponseEnvelopeMixin, BaseRenderer):
+    """
+    Renderer which serializes to MessagePack, using the same envelope as
+    `CustomJSONRenderer`. Uses the Rust-backed ormsgpack library. Values it
+    doesn't serialize natively, and date/time values when the `*_FORMAT`
+    settings aren't ISO 8601, are encoded by the encoders of
+    `json_renderer_class`, so both formats agree.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    options = functools.reduce(
+        operator.or_,
+        api_settings.user_settings.get("ORMSGPACK_RENDERER_OPTIONS", ()),
+        ormsgpack.OPT_SERIALIZE_NUMPY | ormsgpack.OPT_NON_STR_KEYS if ormsgpack else 0,
+    )
+
+    json_renderer_class = CustomJSONRenderer
+
+    @classmethod
+    def get_options(cls) -> int:
+        """
+        Return the ormsgpack options, formatting date/time values like
+        `CustomJSONRenderer.get_options`.
+        """
+        if uses_iso_formats():
+            return cls.options | ormsgpack.OPT_UTC_Z
+        return cls.options | ormsgpack.OPT_PASSTHROUGH_DATETIME
+
+    @classmethod
+    def default(cls, obj: Any) -> Any:
+        """
+        Convert the objects ormsgpack doesn't support natively.
+
+        :param obj: Object of any type to be converted.
+        :return: native python object
+        """
+        return cls.json_renderer_class.default(obj)
+
+    def render(
+        self,
+        data: Any,
+        media_type: Optional[str] = None,
+        renderer_context: Any = None,
+    ) -> bytes:
+        """
+        Serializes Python objects to MessagePack.
+        """
+        assert ormsgpack is not None, "CustomMessagePackRenderer requires ormsgpack"
+        renderer_context = renderer_context or {}
+        if renderer_context.get("response"):
+            payload = self.get_payload(data, renderer_context)
+        elif data is None:
+            return b""
+        else:
+            payload = data
+
+        serialized = ormsgpack.packb(
+            payload, default=self.default, option=self.get_options()
+        )
+        return compress_rendered(serialized, self, renderer_context)
 
 
 class BaseExportRenderer(BaseRenderer):
     default_base_filename = "export"
     header = None
+    # False for formats already compressed, which responses don't compress again
+    compressible = True
+    # Write `RowBatch` chunks as they are, see `accepts_row_batches`
+    row_batches = False
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
         """
@@ -151,23 +414,30 @@ class BaseExportRenderer(BaseRenderer):
         header = writer_opts.get("header", self.header)
         # excel 打开utf-8的文件会乱码，所以改成gbk
         charset = writer_opts.get("charset", self.charset)
-        filename = writer_opts.get("filename")
-        if filename:
-            encoded_filename = quote(filename)
-        else:
-            encoded_filename = f"{self.default_base_filename}.{self.format}"
 
         table = self.tablize(data, header=header)
         file_content = self.get_file_content(
             table, charset=charset, writer_opts=writer_opts
         )
 
+        self.set_content_disposition(response, writer_opts)
+        return compress_rendered(file_content, self, renderer_context)
+
+    def set_content_disposition(self, response, writer_opts):
+        """
+        Mark the response as a file download.
+        """
+        filename = writer_opts.get("filename")
+        if filename:
+            encoded_filename = quote(filename)
+        else:
+            encoded_filename = f"{self.default_base_filename}.{self.format}"
+
         # 解决下载中文文件名乱码问题, 详情见: RFC 5987: https://www.rfc-editor.org/rfc/rfc5987.txt
         if response:
             response[
                 "content-disposition"
             ] = f"attachment; filename*=UTF-8''{encoded_filename}"
-        return file_content
 
     def get_file_content(self, table, charset=None, writer_opts=None) -> bytes:
         raise NotImplementedError
@@ -179,6 +449,40 @@ class BaseExportRenderer(BaseRenderer):
 
         return value
 
+    def get_row_getter(self, header):
+        """
+        Return the function building the row of an item.
+        """
+        get_value = self.get_value
+        return lambda item: [get_value(item, key) for key in header]
+
+    def accepts_row_batches(self) -> bool:
+        """
+        Return True if `RowBatch` chunks can be written as they are, i.e. rows
+        are not built by an overridden `get_value` or `flatten_data`.
+        """
+        renderer_class = type(self)
+        return (
+            self.row_batches
+            and renderer_class.get_value is BaseExportRenderer.get_value
+            and renderer_class.flatten_data is BaseExportRenderer.flatten_data
+        )
+
+    def tablize_rows(self, rows, row_header, header=None):
+        """
+        Yield the header and the rows of a `RowBatch`, reordered if another
+        header is requested.
+        """
+        if not header or list(header) == list(row_header):
+            yield row_header
+            yield from rows
+            return
+
+        positions = {key: index for index, key in enumerate(row_header)}
+        yield header
+        for row in rows:
+            yield [row[positions[key]] if key in positions else "" for key in header]
+
     def tablize(self, data, header=None):
         """
         Convert a list of data into a table.
@@ -190,6 +494,10 @@ class BaseExportRenderer(BaseRenderer):
         provide a header to the renderer (using the `header` attribute, or via
         the `renderer_context`).
         """
+        if isinstance(data, RowBatch):
+            yield from self.tablize_rows(data, data.header, header)
+            return
+
         # Try to pull the header off of the data, if it's not passed in as an
         # argument.
         if not header and hasattr(data, "header"):
@@ -213,8 +521,9 @@ class BaseExportRenderer(BaseRenderer):
             yield header
             # Create a row for each dictionary, filling in columns for which the
             # item has no data with None values.
+            get_row = self.get_row_getter(header)
             for item in data:
-                yield (self.get_value(item, key) for key in header)
+                yield get_row(item)
         elif header:
             # If there's no data but a header was supplied, yield the header.
             yield header
@@ -232,6 +541,33 @@ class BaseExportRenderer(BaseRenderer):
             yield dict(item)
 
 
+class EncodedCSVWriter:
+    """
+    The C `csv` writer over a text buffer. The buffered rows are encoded in
+    blocks by an incremental encoder instead of cell by cell.
+    """
+
+    def __init__(self, encoding=None, errors="strict", **fmtparams):
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer, **fmtparams)
+        self.encoder = codecs.getincrementalencoder(encoding or "utf-8")(errors)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def writerows(self, rows):
+        self.writer.writerows(rows)
+
+    def flush(self, final=False) -> bytes:
+        """
+        Return the encoded bytes of the rows written since the last flush.
+        """
+        content = self.encoder.encode(self.buffer.getvalue(), final)
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return content
+
+
 class CustomCSVRenderer(BaseExportRenderer):
     """
     Renderer which serializes to CSV
@@ -242,6 +578,9 @@ class CustomCSVRenderer(BaseExportRenderer):
     charset = "gbk"  # excel 打开utf-8的文件会乱码，所以改成gbk
     writer_opts = None
     data_key = "results"
+    row_batches = True
+    # Rows encoded at once
+    block_size = 2000
 
     def get_file_content(self, table, charset=None, writer_opts=None) -> bytes:
         """
@@ -251,12 +590,48 @@ class CustomCSVRenderer(BaseExportRenderer):
         and returning the resulting file content.
         """
         output = BytesIO()
-        writer = csv.writer(output, encoding=charset)
-        for row in table:
-            writer.writerow(row)
+        writer = EncodedCSVWriter(encoding=charset)
+        for rows in chunked(table, self.block_size):
+            writer.writerows(rows)
+            output.write(writer.flush())
 
+        output.write(writer.flush(final=True))
         return output.getvalue()
 
+    def get_row_getter(self, header):
+        if type(self).get_value is not BaseExportRenderer.get_value:
+            return super().get_row_getter(header)
+
+        # The csv writer already applies `str()` to nested values
+        return lambda item: [item.get(key, "") for key in header]
+
+    def render_stream(
+        self, chunks: Iterable[List[Any]], writer_opts: Optional[Dict] = None
+    ) -> Iterator[bytes]:
+        """
+        Encode rows chunk by chunk, yielding the bytes of each chunk. The
+        header is taken from the first row unless provided.
+        """
+        writer_opts = writer_opts or {}
+        header = writer_opts.get("header", self.header)
+        writer = EncodedCSVWriter(encoding=writer_opts.get("charset", self.charset))
+        header_written = False
+        for chunk in chunks:
+            if not chunk:
+                continue
+
+            table = self.tablize(chunk, header=header)
+            header = next(table)
+            if not header_written:
+                writer.writerow(header)
+                header_written = True
+            writer.writerows(table)
+            yield writer.flush()
+
+        if header and not header_written:
+            writer.writerow(header)
+        yield writer.flush(final=True)
+
 
 class CustomXLSXRenderer(BaseExportRenderer):
     """
@@ -276,9 +651,31 @@ class CustomXLSXRenderer(BaseExportRenderer):
         "freeze_header": True,
         "freeze_panes": "A2",
     }
+    row_batches = True
+    # xlsx files are zip archives
+    compressible = False
+
+    # Stream rows through a write-only workbook instead of keeping every cell,
+    # also enabled per export by the `write_only` writer option
+    write_only = False
+    # Start a new sheet when one is full
+    max_sheet_rows = MAX_SHEET_ROWS
+    # Build the sheet XML in a pool of this many processes (`XLSXWriter`), shared
+    # by the exports of the serving process. Falls back to the current process
+    # when the interpreter can't spawn workers, e.g. under uWSGI.
+    processes = None
 
     def get_file_content(self, table, charset=None, writer_opts=None):
         writer_opts = writer_opts or {}
+        if not writer_opts.get("write_only", self.write_only):
+            return self.get_workbook_content(table, writer_opts)
+
+        output = BytesIO()
+        with self.write_to_file(table, writer_opts) as file:
+            shutil.copyfileobj(file, output)
+        return output.getvalue()
+
+    def get_workbook_content(self, table, writer_opts):
         export_style = writer_opts.get("export_style", self.default_export_style)
 
         output = BytesIO()
@@ -300,3 +697,197 @@ class CustomXLSXRenderer(BaseExportRenderer):
         workbook.save(output)
 
         return output.getvalue()
+
+    def get_header_cell(self, sheet, value, export_style):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = export_style["header_font"]
+        cell.fill = export_style["header_fill"]
+        cell.alignment = export_style["header_alignment"]
+        return cell
+
+    def write_to_file(self, table, writer_opts=None):
+        """
+        Write the table through a write-only workbook into a temporary file
+        and return the file, positioned at its start.
+
+        Rows are written to disk as they are appended, so memory does not
+        grow with the number of rows.
+        """
+        writer_opts = writer_opts or {}
+        export_style = writer_opts.get("export_style", self.default_export_style)
+        processes = writer_opts.get("processes", self.processes)
+        file = tempfile.TemporaryFile()
+        if processes:
+            writer = XLSXWriter(export_style, processes, self.max_sheet_rows)
+            writer.write(file, table)
+            file.seek(0)
+            return file
+
+        workbook = Workbook(write_only=True)
+        rows = iter(table)
+        header = next(rows, None)
+        sheet = self.create_sheet(workbook, header, export_style)
+        header_rows = sheet_rows = 0 if header is None else 1
+        for row in rows:
+            if sheet_rows == self.max_sheet_rows:
+                sheet = self.create_sheet(workbook, header, export_style)
+                sheet_rows = header_rows
+            sheet.append(row)
+            sheet_rows += 1
+
+        workbook.save(file)
+        file.seek(0)
+        return file
+
+    def create_sheet(self, workbook, header, export_style):
+        """
+        Add a write-only sheet starting with the styled header row.
+        """
+        sheet = workbook.create_sheet()
+        # Sheet properties must be set before the first row is written
+        sheet.freeze_panes = export_style.get("freeze_panes", True)
+        sheet.print_title_rows = "1:1"
+        sheet.row_dimensions[1].height = export_style["header_height"]
+        if header is not None:
+            sheet.append(
+                [self.get_header_cell(sheet, value, export_style) for value in header]
+            )
+        return sheet
+
+    def render_to_file(
+        self, chunks: Iterable[List[Any]], writer_opts: Optional[Dict] = None
+    ):
+        """
+        Write rows chunk by chunk into a temporary workbook file. The header
+        is taken from the first row unless provided.
+        """
+        writer_opts = writer_opts or {}
+        header = writer_opts.get("header", self.header)
+        chunks = (chunk for chunk in chunks if chunk)
+        first_chunk = next(chunks, None)
+        rows = chain.from_iterable(chunks)
+        if isinstance(first_chunk, RowBatch):
+            rows = chain(first_chunk, rows)
+            table = self.tablize_rows(rows, first_chunk.header, header)
+        else:
+            data = [] if first_chunk is None else chain(first_chunk, rows)
+            table = self.tablize(data, header=header)
+
+        return self.write_to_file(table, writer_opts)
+
+
+class CustomNDJSONRenderer(BaseExportRenderer):
+    """
+    Renderer which serializes rows to newline delimited JSON, one object per
+    line. Nested values keep their structure.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+    data_key = "results"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if data is None:
+            return bytes()
+
+        if isinstance(data, dict):
+            try:
+                data = data[self.data_key]
+            except (KeyError, TypeError):
+                data = []
+
+        writer_opts = renderer_context.get("writer_opts", {})
+        self.set_content_disposition(renderer_context.get("response"), writer_opts)
+        file_content = b"".join(self.render_stream([data]))
+        return compress_rendered(file_content, self, renderer_context)
+
+    def render_stream(
+        self, chunks: Iterable[List[Any]], writer_opts: Optional[Dict] = None
+    ) -> Iterator[bytes]:
+        """
+        Serializes rows chunk by chunk, one encoded chunk at a time.
+        """
+        default = CustomJSONRenderer.default
+        options = CustomJSONRenderer.get_options() | orjson.OPT_APPEND_NEWLINE
+        for chunk in chunks:
+            if chunk:
+                yield b"".join(
+                    orjson.dumps(row, default=default, option=options) for row in chunk
+                )
+
+
+class BaseArrowRenderer(BaseExportRenderer):
+    """
+    Base renderer for Apache Arrow based file formats.
+
+    Renders the `RecordBatchStream` built by `ExportMixin` batch by batch.
+    Plain serialized data is converted with inferred column types.
+    """
+
+    charset = None
+    data_key = "results"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert pa is not None, "pyarrow must be installed to render arrow files"
+        renderer_context = renderer_context or {}
+        if data is None:
+            return bytes()
+
+        if isinstance(data, dict):
+            try:
+                data = data[self.data_key]
+            except (KeyError, TypeError):
+                data = []
+
+        if not isinstance(data, RecordBatchStream):
+            table = pa.Table.from_pylist([dict(item) for item in data])
+            data = RecordBatchStream(table.schema, table.to_batches())
+
+        sink = pa.BufferOutputStream()
+        self.write_batches(sink, data)
+
+        writer_opts = renderer_context.get("writer_opts", {})
+        self.set_content_disposition(renderer_context.get("response"), writer_opts)
+        return self.compress(sink.getvalue().to_pybytes(), renderer_context)
+
+    def write_batches(self, sink, stream):
+        raise NotImplementedError
+
+    def compress(self, file_content, renderer_context):
+        return compress_rendered(file_content, self, renderer_context)
+
+
+class CustomArrowRenderer(BaseArrowRenderer):
+    """
+    Renderer for the Arrow IPC file format (feather v2).
+    """
+
+    media_type = "application/vnd.apache.arrow.file"
+    format = "arrow"
+    render_style = "binary"
+
+    def write_batches(self, sink, stream):
+        # Choice columns grow their dictionary between batches
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        with pa.ipc.new_file(sink, stream.schema, options=options) as writer:
+            for batch in stream:
+                writer.write_batch(batch)
+
+
+class CustomParquetRenderer(BaseArrowRenderer):
+    """
+    Renderer for the Apache Parquet format, one row group per batch.
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+    render_style = "binary"
+    # Parquet pages are already compressed
+    compressible = False
+
+    def write_batches(self, sink, stream):
+        with pq.ParquetWriter(sink, stream.schema) as writer:
+            for batch in stream:
+                writer.write_batch(batch)
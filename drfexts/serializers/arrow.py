@@ -0,0 +1,207 @@
+import orjson
+from django.conf import settings
+from rest_framework import fields as drf_fields
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+from ..utils import chunked
+from .fields import SequenceField
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+__all__ = ("RecordBatchStream", "ArrowBatchBuilder")
+
+# Arrow decimals hold at most 38 digits
+MAX_DECIMAL_DIGITS = 38
+
+
+class RecordBatchStream:
+    """
+    An iterable of record batches sharing one schema, built lazily.
+    """
+
+    def __init__(self, schema, batches):
+        self.schema = schema
+        self.batches = batches
+
+    def __iter__(self):
+        return iter(self.batches)
+
+
+class ArrowColumn:
+    """
+    One typed column: how to read a value from an instance and the arrow type
+    of the resulting array.
+    """
+
+    def __init__(self, name, field, arrow_type, raw=False, translate=None):
+        self.name = name
+        self.field = field
+        self.arrow_type = arrow_type
+        # Typed columns take the attribute as is, skipping `to_representation`
+        self.raw = raw
+        # The export translation of the representation, see `ExportColumn`
+        self.translate = translate
+
+    def get_value(self, instance):
+        field = self.field
+        try:
+            attribute = field.get_attribute(instance)
+        except (SkipField, AttributeError):
+            return None
+
+        check_for_none = (
+            attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        )
+        if check_for_none is None:
+            return None
+
+        if self.raw:
+            return attribute
+
+        return self.convert(field.to_representation(attribute))
+
+    def convert(self, value):
+        if self.translate is not None:
+            value = self.translate(value)
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (dict, list)):
+            return orjson.dumps(value).decode()
+        return str(value)
+
+    def to_array(self, values):
+        return pa.array(values, type=self.arrow_type)
+
+
+class IntegerColumn(ArrowColumn):
+    def convert(self, value):
+        return value
+
+
+class DecimalColumn(ArrowColumn):
+    def get_value(self, instance):
+        value = super().get_value(instance)
+        return None if value is None else self.field.quantize(value)
+
+
+class ChoiceColumn(ArrowColumn):
+    """
+    A dictionary-encoded column of choice labels.
+
+    The dictionary only ever grows, so the batches of one export share a
+    common prefix and are written as dictionary deltas.
+    """
+
+    def __init__(self, name, field):
+        super().__init__(name, field, pa.dictionary(pa.int32(), pa.string()), raw=True)
+        self.labels = []
+        self.indexes = {}
+        for label in field.choices.values():
+            self._index(str(label))
+
+    def _index(self, label):
+        index = self.indexes.get(label)
+        if index is None:
+            index = self.indexes[label] = len(self.labels)
+            self.labels.append(label)
+        return index
+
+    def get_value(self, instance):
+        value = super().get_value(instance)
+        if value in ("", None):
+            return None
+        return self._index(str(self.field.choices.get(value, value)))
+
+    def to_array(self, values):
+        return pa.DictionaryArray.from_arrays(
+            pa.array(values, type=pa.int32()), pa.array(self.labels, type=pa.string())
+        )
+
+
+def _timestamp_type():
+    return pa.timestamp("us", tz="UTC" if settings.USE_TZ else None)
+
+
+def build_column(name, field, translate=None):
+    """
+    Map a serializer field to an `ArrowColumn`. Fields overriding
+    `to_representation` are exported as strings, like any unknown field,
+    after the export translation `translate`.
+    """
+    field_class = type(field)
+    if isinstance(field, drf_fields.ChoiceField) and not isinstance(
+        field, drf_fields.MultipleChoiceField
+    ):
+        return ChoiceColumn(name, field)
+
+    if field_class.to_representation is SequenceField.to_representation:
+        return IntegerColumn(name, field, pa.int64())
+
+    if (
+        isinstance(field, drf_fields.DecimalField)
+        and field_class.to_representation is drf_fields.DecimalField.to_representation
+        and field.max_digits is not None
+        and field.decimal_places is not None
+        and field.max_digits <= MAX_DECIMAL_DIGITS
+    ):
+        decimal_type = pa.decimal128(field.max_digits, field.decimal_places)
+        return DecimalColumn(name, field, decimal_type, raw=True)
+
+    typed_fields = (
+        (drf_fields.BooleanField, pa.bool_),
+        (drf_fields.IntegerField, pa.int64),
+        (drf_fields.FloatField, pa.float64),
+        (drf_fields.DateTimeField, _timestamp_type),
+        (drf_fields.DateField, pa.date32),
+        (drf_fields.TimeField, lambda: pa.time64("us")),
+        (drf_fields.DurationField, lambda: pa.duration("us")),
+    )
+    for typed_field, arrow_type in typed_fields:
+        if (
+            isinstance(field, typed_field)
+            and field_class.to_representation is typed_field.to_representation
+        ):
+            return ArrowColumn(name, field, arrow_type(), raw=True)
+
+    return ArrowColumn(name, field, pa.string(), translate=translate)
+
+
+class ArrowBatchBuilder:
+    """
+    Build record batches column by column from chunks of model instances.
+
+    Columns are named after the field labels, like the csv/xlsx export, and
+    follow the `fields` selection of an `ExportSerializerMixin` serializer.
+    """
+
+    def __init__(self, serializer):
+        assert pa is not None, "pyarrow must be installed to export arrow files"
+        self.serializer = serializer
+        plan = getattr(serializer, "export_plan", None)
+        if plan is None:
+            plan = [(str(field.label), field) for field in serializer._readable_fields]
+        self.columns = [build_column(*column) for column in plan]
+        self.schema = pa.schema(
+            [(column.name, column.arrow_type) for column in self.columns]
+        )
+
+    def build(self, instances):
+        """
+        Return the record batch of a chunk of instances.
+        """
+        arrays = [
+            column.to_array([column.get_value(instance) for instance in instances])
+            for column in self.columns
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def stream(self, instances, chunk_size):
+        """
+        Return a `RecordBatchStream` over `instances`, `chunk_size` at a time.
+        """
+        batches = (self.build(chunk) for chunk in chunked(instances, chunk_size))
+        return RecordBatchStream(self.schema, batches)
@@ -1,8 +1,13 @@
-import collections
+from collections.abc import Mapping
+from functools import reduce
+from operator import or_
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import (
     ChoiceField,
     Field,
@@ -12,6 +17,8 @@ from rest_framework.fields import (
 )
 from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
 
+from ..utils import chunked
+
 __all__ = (
     "SequenceField",
     "DisplayChoiceField",
@@ -19,9 +26,72 @@ __all__ = (
     "IsNullField",
     "IsNotNullField",
     "ComplexPKRelatedField",
+    "BatchResolveMixin",
 )
 
 
+class BatchResolveMixin:
+    """
+    Lets a related field load the objects of many input values at once.
+
+    `resolve` loads the objects of the given values with a query per
+    `resolve_batch_size` of them, then `get_resolved` finds them without a
+    query. Values not found that way are looked up again by
+    `to_internal_value`, which reports the missing ones.
+    """
+
+    # Values looked up per query
+    resolve_batch_size = 500
+    # Loaded objects by key, None until `resolve` is called
+    resolved = None
+
+    def get_key(self, data):
+        """
+        Return the key of an input value. Raises `TypeError`, `ValueError`
+        or a `ValidationError` if it has none.
+        """
+        raise NotImplementedError
+
+    def get_instance_key(self, instance):
+        raise NotImplementedError
+
+    def get_keys_filter(self, keys):
+        """
+        Return the `Q` filtering the objects of `keys`.
+        """
+        raise NotImplementedError
+
+    def resolve(self, values):
+        """
+        Load the objects of the input values.
+        """
+        self.resolved = {}
+        queryset = self.get_queryset()
+        self.resolved_model = queryset.model
+        keys = set()
+        for data in values:
+            try:
+                keys.add(self.get_key(data))
+            except (TypeError, ValueError, ValidationError, DjangoValidationError):
+                continue
+
+        for chunk in chunked(keys, self.resolve_batch_size):
+            for instance in queryset.filter(self.get_keys_filter(chunk)):
+                self.resolved[self.get_instance_key(instance)] = instance
+
+    def get_resolved(self, data):
+        """
+        Return the loaded object of an input value, or None.
+        """
+        if not self.resolved:
+            return None
+
+        try:
+            return self.resolved.get(self.get_key(data))
+        except (TypeError, ValueError, ValidationError, DjangoValidationError):
+            return None
+
+
 class SequenceField(Field):
     """
     A read-only field that output increasing number started from zero.
@@ -71,7 +141,7 @@ class DisplayChoiceField(ChoiceField):
     choices = property(ChoiceField._get_choices, _set_choices)
 
 
-class MultiSlugRelatedField(RelatedField):
+class MultiSlugRelatedField(BatchResolveMixin, RelatedField):
     """
     Represents a relationship using a unique set of fields on the target.
     """
@@ -86,16 +156,55 @@ class MultiSlugRelatedField(RelatedField):
         self.slug_fields = slug_fields
         super().__init__(**kwargs)
 
+    def get_slug_model_fields(self):
+        fields = [
+            self.resolved_model._meta.get_field(slug_field)
+            for slug_field in self.slug_fields
+        ]
+        if not all(field.concrete and not field.many_to_many for field in fields):
+            raise FieldDoesNotExist
+        return fields
+
+    def resolve(self, values):
+        self.resolved_model = self.get_queryset().model
+        try:
+            self.slug_model_fields = self.get_slug_model_fields()
+        except FieldDoesNotExist:
+            # Slug fields spanning relations are looked up one by one
+            return
+        super().resolve(values)
+
+    def get_key(self, data):
+        if not isinstance(data, Mapping) or set(data) != set(self.slug_fields):
+            raise ValueError
+        return tuple(
+            field.to_python(data[slug_field])
+            for slug_field, field in zip(self.slug_fields, self.slug_model_fields)
+        )
+
+    def get_instance_key(self, instance):
+        return tuple(
+            getattr(instance, field.attname) for field in self.slug_model_fields
+        )
+
+    def get_keys_filter(self, keys):
+        if len(self.slug_fields) == 1:
+            return Q(**{f"{self.slug_fields[0]}__in": [key[0] for key in keys]})
+        return reduce(or_, (Q(**dict(zip(self.slug_fields, key))) for key in keys))
+
     def to_internal_value(self, data):
-        if not isinstance(data, collections.Mapping):
+        if not isinstance(data, Mapping):
             self.fail("invalid")
         if not set(data.keys()) == set(self.slug_fields):
             self.fail("invalid")
+        instance = self.get_resolved(data)
+        if instance is not None:
+            return instance
         try:
             instance = self.get_queryset().get(**data)
             return instance
         except ObjectDoesNotExist:
-            lookups = ["=".join((lookup, value)) for lookup, value in data.items()]
+            lookups = [f"{lookup}={value}" for lookup, value in data.items()]
             self.fail("does_not_exist", error_msg=" ".join(lookups))
         except (TypeError, ValueError):
             self.fail("invalid")
@@ -129,7 +238,7 @@ class IsNotNullField(IsNullField):
         return value is not None
 
 
-class ComplexPKRelatedField(PrimaryKeyRelatedField):
+class ComplexPKRelatedField(BatchResolveMixin, PrimaryKeyRelatedField):
     def __init__(
         self,
         pk_field_name="id",
@@ -149,14 +258,34 @@ class ComplexPKRelatedField(PrimaryKeyRelatedField):
         self.instance = instance  # cache instance for `to_representation`
         return super().get_attribute(instance)
 
-    def to_internal_value(self, data):
+    def get_pk_value(self, data):
         try:
-            data = data[self.pk_field_name]
-        except TypeError:
-            pass
+            return data[self.pk_field_name]
+        except (TypeError, KeyError):
+            return data
 
+    def to_internal_value(self, data):
+        data = self.get_pk_value(data)
+        instance = self.get_resolved(data)
+        if instance is not None:
+            return instance
         return super().to_internal_value(data)
 
+    def get_key(self, data):
+        data = self.get_pk_value(data)
+        # As `PrimaryKeyRelatedField` does
+        if isinstance(data, bool):
+            raise TypeError
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        return self.resolved_model._meta.pk.to_python(data)
+
+    def get_instance_key(self, instance):
+        return instance.pk
+
+    def get_keys_filter(self, keys):
+        return Q(pk__in=keys)
+
     def to_representation(self, value):
         try:
             attr_obj = get_attribute(
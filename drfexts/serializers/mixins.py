@@ -1,16 +1,94 @@
 import json
-from collections import OrderedDict
-from functools import cached_property
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from functools import cached_property, lru_cache
 
+from rest_framework import fields as drf_fields
+from rest_framework import serializers
 from rest_framework.fields import BooleanField, ChoiceField, SkipField
-from rest_framework.relations import PKOnlyObject
-from rest_framework.serializers import BaseSerializer, ListSerializer, ModelSerializer
+from rest_framework.relations import ManyRelatedField, PKOnlyObject
+from rest_framework.serializers import (
+    LIST_SERIALIZER_KWARGS,
+    BaseSerializer,
+    ListSerializer,
+    ModelSerializer,
+)
 
 from ..utils import get_serializer_field
-from .fields import ComplexPKRelatedField
+from .fields import BatchResolveMixin, ComplexPKRelatedField
+from .validators import check_unique_values
 
+# Arguments of the list serializer only, `allow_empty` before DRF 3.14
+LIST_SERIALIZER_KWARGS_REMOVE = getattr(
+    serializers, "LIST_SERIALIZER_KWARGS_REMOVE", ("allow_empty",)
+)
 
-class DynamicFieldsSerializer(ModelSerializer):
+
+def resolve_related_objects(serializer, items):
+    """
+    Load the related objects referenced by the input items of `serializer`
+    with a query per related field, instead of one per item and field.
+    """
+    items = [item for item in items if isinstance(item, Mapping)]
+    for field_name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+
+        if isinstance(field, BatchResolveMixin):
+            field.resolve(item[field_name] for item in items if field_name in item)
+        elif isinstance(field, ManyRelatedField) and isinstance(
+            field.child_relation, BatchResolveMixin
+        ):
+            field.child_relation.resolve(
+                value
+                for item in items
+                if isinstance(item.get(field_name), (list, tuple))
+                for value in item[field_name]
+            )
+
+
+class BulkListSerializer(ListSerializer):
+    """
+    Resolves the related objects and checks the unique values of all the
+    items before validating them.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            resolve_related_objects(self.child, data)
+            check_unique_values(self.child, data)
+        return super().to_internal_value(data)
+
+
+class BulkSerializerMixin:
+    """
+    Validates `many=True` input with `BulkListSerializer`, unless the `Meta`
+    sets another `list_serializer_class`.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if hasattr(getattr(cls, "Meta", None), "list_serializer_class"):
+            return super().many_init(*args, **kwargs)
+
+        # As `BaseSerializer.many_init` does
+        list_kwargs = {}
+        for key in LIST_SERIALIZER_KWARGS_REMOVE:
+            value = kwargs.pop(key, None)
+            if value is not None:
+                list_kwargs[key] = value
+        list_kwargs["child"] = cls(*args, **kwargs)
+        list_kwargs.update(
+            {
+                key: value
+                for key, value in kwargs.items()
+                if key in LIST_SERIALIZER_KWARGS
+            }
+        )
+        return BulkListSerializer(*args, **list_kwargs)
+
+
+class DynamicFieldsSerializer(BulkSerializerMixin, ModelSerializer):
     """
     A ModelSerializer that takes an additional `fields` argument that
     controls which fields should be displayed.
@@ -31,6 +109,55 @@ class DynamicFieldsSerializer(ModelSerializer):
                 self.fields.pop(field_name)
 
 
+# One exported column: its header, the serializer field and the translation
+# applied to the field representation (None if the value is kept as is)
+ExportColumn = namedtuple("ExportColumn", ["label", "field", "convert"])
+
+
+def _related_label(value):
+    return value.get("label")
+
+
+def _related_labels(value):
+    return "\n".join(x.get("label", "") for x in value)
+
+
+def _bool_label(value):
+    return "是" if value else "否"
+
+
+def _dict_list(value):
+    return [dict(x) for x in value]
+
+
+# Translations returning plain values
+SCALAR_CONVERTERS = (_related_label, _related_labels, _bool_label)
+
+# Fields whose own `to_representation` returns plain values
+SCALAR_FIELDS = (
+    drf_fields.CharField,
+    drf_fields.IntegerField,
+    drf_fields.FloatField,
+    drf_fields.DecimalField,
+    drf_fields.DateTimeField,
+    drf_fields.DateField,
+    drf_fields.TimeField,
+    drf_fields.DurationField,
+    drf_fields.UUIDField,
+)
+
+
+class RowBatch(list):
+    """
+    A chunk of exported rows: tuples of values in `header` order, as written
+    to csv/xlsx files (nested values are already converted to strings).
+    """
+
+    def __init__(self, header, rows=()):
+        super().__init__(rows)
+        self.header = header
+
+
 class ExportSerializerMixin:
     @cached_property
     def _export_info(self):
@@ -50,6 +177,9 @@ class ExportSerializerMixin:
         获取导出字段
         :return:
         """
+        return [column.field for column in self.export_plan]
+
+    def _iter_export_fields(self):
         field_names, fields_map = self._export_info
         if not field_names:
             yield from self._readable_fields
@@ -64,43 +194,69 @@ class ExportSerializerMixin:
             field.source_attrs = source_attrs
             yield field
 
-    def _trans_value(self, value, field):
+    @cached_property
+    def export_plan(self):
         """
-        字段进行翻译
-        :param value:
+        导出计划: 每个导出列的表头、字段及翻译函数, 每个序列化器实例只生成一次
+        :return:
+        """
+        plan = []
+        for field in self._iter_export_fields():
+            field.label = str(field.label)
+            plan.append(ExportColumn(field.label, field, self.get_converter(field)))
+
+        return plan
+
+    def get_converter(self, field):
+        """
+        返回字段值的翻译函数, 无需翻译时返回 None
         :param field:
         :return:
         """
+        if type(self)._trans_value is not ExportSerializerMixin._trans_value:
+            return lambda value: self._trans_value(value, field)
+
+        return self._get_default_converter(field)
+
+    @staticmethod
+    def _get_default_converter(field):
         if isinstance(field, ComplexPKRelatedField):
-            value = value.get("label")
+            return _related_label
         elif isinstance(getattr(field, "child_relation", None), ComplexPKRelatedField):
-            value = "\n".join(x.get("label", "") for x in value)
+            return _related_labels
         elif isinstance(field, ChoiceField):
-            value = dict(field.choices).get(value)
+            return dict(field.choices).get
         elif isinstance(field, BooleanField):
-            value = "是" if value else "否"
+            return _bool_label
         elif isinstance(field, ListSerializer):
-            value = [dict(x) for x in value]
+            return _dict_list
         elif isinstance(field, BaseSerializer):
-            value = dict(value)
+            return dict
 
-        return value
+        return None
+
+    def _trans_value(self, value, field):
+        """
+        字段进行翻译
+        :param value:
+        :param field:
+        :return:
+        """
+        convert = self._get_default_converter(field)
+        return value if convert is None else convert(value)
 
     def to_representation(self, instance):
         """
         Object instance -> Dict of primitive datatypes.
         """
         ret = OrderedDict()
-        fields = self.export_fields
-
-        for field in fields:
-            field.label = str(field.label)
+        for label, field, convert in self.export_plan:
             try:
                 attribute = field.get_attribute(instance)
             except SkipField:
                 continue
             except AttributeError:
-                ret[field.label] = ""
+                ret[label] = ""
                 continue
 
             # We skip `to_representation` for `None` values so that fields do
@@ -112,9 +268,89 @@ class ExportSerializerMixin:
                 attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
             )
             if check_for_none is None:
-                ret[field.label] = None
+                ret[label] = None
+            elif convert is None:
+                ret[label] = field.to_representation(attribute)
             else:
-                value = field.to_representation(attribute)
-                ret[field.label] = self._trans_value(value, field)
+                ret[label] = convert(field.to_representation(attribute))
 
         return ret
+
+    @cached_property
+    def _row_plan(self):
+        row_plan = []
+        for _, field, convert in self.export_plan:
+            if convert is not None:
+                scalar = convert in SCALAR_CONVERTERS or (
+                    isinstance(field, ChoiceField)
+                    and type(self)._trans_value is ExportSerializerMixin._trans_value
+                )
+            else:
+                scalar = any(
+                    isinstance(field, field_class)
+                    and type(field).to_representation is field_class.to_representation
+                    for field_class in SCALAR_FIELDS
+                )
+            row_plan.append((field, convert, scalar))
+
+        return row_plan
+
+    def _get_column(self, field, convert, instances):
+        column = []
+        append = column.append
+        to_representation = field.to_representation
+        for instance in instances:
+            try:
+                attribute = field.get_attribute(instance)
+            except (SkipField, AttributeError):
+                append("")
+                continue
+
+            check_for_none = (
+                attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            )
+            if check_for_none is None:
+                append(None)
+            elif convert is None:
+                append(to_representation(attribute))
+            else:
+                append(convert(to_representation(attribute)))
+
+        return column
+
+    def to_rows(self, instances):
+        """
+        按列批量生成导出行: 逐列取值并翻译, 再组合为与表头顺序一致的行元组,
+        供 csv/xlsx 渲染器直接写入
+        :param instances:
+        :return:
+        """
+        columns = []
+        for field, convert, scalar in self._row_plan:
+            column = self._get_column(field, convert, instances)
+            if not scalar:
+                column = [
+                    str(value) if isinstance(value, (dict, list)) else value
+                    for value in column
+                ]
+            columns.append(column)
+
+        header = [column.label for column in self.export_plan]
+        if not columns:
+            return RowBatch(header, [()] * len(instances))
+
+        return RowBatch(header, zip(*columns))
+
+
+@lru_cache(maxsize=None)
+def get_export_serializer_class(serializer_class):
+    """
+    返回序列化器对应的导出序列化器类, 每个序列化器类只创建一次
+    :param serializer_class:
+    :return:
+    """
+
+    class ExportSerializer(ExportSerializerMixin, serializer_class):
+        ...
+
+    return ExportSerializer
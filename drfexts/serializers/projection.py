@@ -0,0 +1,295 @@
+import logging
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import Serializer
+
+from .fields import ComplexPKRelatedField, DisplayChoiceField
+
+try:
+    from rest_flex_fields.serializers import FlexFieldsSerializerMixin
+except ImportError:  # pragma: no cover
+    FlexFieldsSerializerMixin = None
+
+__all__ = ("ValuesPlan", "ValuesListSerializer", "compile_values_plan")
+
+logger = logging.getLogger(__name__)
+
+# serializer field -> model fields whose database values it returns unchanged
+PASSTHROUGH_FIELDS = {
+    drf_fields.CharField: (models.CharField, models.TextField),
+    drf_fields.EmailField: (models.EmailField,),
+    drf_fields.SlugField: (models.SlugField,),
+    drf_fields.URLField: (models.URLField,),
+    drf_fields.IntegerField: (models.IntegerField,),
+    drf_fields.BooleanField: (models.BooleanField,),
+    drf_fields.FloatField: (models.FloatField,),
+}
+
+# serializer fields whose `to_representation` only depends on the value
+CONVERTED_FIELDS = (
+    *PASSTHROUGH_FIELDS,
+    drf_fields.DateTimeField,
+    drf_fields.DateField,
+    drf_fields.TimeField,
+    drf_fields.DurationField,
+    drf_fields.DecimalField,
+    drf_fields.UUIDField,
+    drf_fields.IPAddressField,
+    drf_fields.JSONField,
+)
+
+PLAIN_REPRESENTATIONS = (Serializer.to_representation,)
+if FlexFieldsSerializerMixin is not None:
+    PLAIN_REPRESENTATIONS += (FlexFieldsSerializerMixin.to_representation,)
+
+
+class ValuesPlan:
+    """
+    A serializer compiled into a `queryset.values(...)` projection.
+
+    `columns` is a list of `(field_name, getter)` pairs, where `getter` builds
+    the representation of the field from one row returned by `values()`.
+    """
+
+    def __init__(self, lookups, columns):
+        self.lookups = lookups
+        self.columns = columns
+
+    def project(self, queryset):
+        """
+        Restrict the queryset to the lookups required by the plan.
+        """
+        return queryset.prefetch_related(None).values(*self.lookups)
+
+    def to_representation(self, rows):
+        columns = self.columns
+        return [{name: getter(row) for name, getter in columns} for row in rows]
+
+
+class ValuesListSerializer:
+    """
+    Stand-in for a `many=True` serializer over rows produced by a `ValuesPlan`.
+    """
+
+    def __init__(self, plan, instance=None):
+        self.plan = plan
+        self.instance = instance
+
+    def to_representation(self, rows):
+        return self.plan.to_representation(rows)
+
+    @property
+    def data(self):
+        return self.to_representation(self.instance or ())
+
+
+def _resolve_lookup(model, source_attrs, relation=False):
+    """
+    Resolve a serializer source to a `values()` lookup.
+
+    Return `(lookup, model_field, nullable)` or None if the source does not
+    map to a chain of forward relations ending in a concrete field.
+    """
+    nullable = False
+    model_field = None
+    for index, attr in enumerate(source_attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+
+        is_last = index == len(source_attrs) - 1
+        if model_field.is_relation:
+            if is_last and (relation or attr == model_field.attname):
+                break
+            if is_last:
+                return None
+            nullable = nullable or model_field.null
+            model = model_field.related_model
+        elif not is_last:
+            return None
+
+    return "__".join(source_attrs), model_field, nullable
+
+
+def _value_getter(lookup, convert=None):
+    if convert is None:
+        return itemgetter(lookup)
+
+    def getter(row):
+        value = row[lookup]
+        return None if value is None else convert(value)
+
+    return getter
+
+
+def _choice_getter(lookup, mapping):
+    def getter(row):
+        value = row[lookup]
+        if value in ("", None):
+            return value
+        return mapping.get(str(value), value)
+
+    return getter
+
+
+def _related_getter(field, lookup, display_lookup, extra_lookups):
+    pk_field_name = field.pk_field_name
+    display_field_name = field.display_field_name
+
+    def getter(row):
+        pk = row[lookup]
+        if pk is None:
+            return None
+
+        data = {pk_field_name: pk}
+        if display_lookup:
+            data[display_field_name] = row[display_lookup]
+        for field_name, extra_lookup in extra_lookups:
+            data[field_name] = row[extra_lookup]
+        return data
+
+    return getter
+
+
+def _resolve_relation(field, model):
+    """
+    Resolve the source of a related field to `(lookup, related_model)`.
+    """
+    if field.pk_field is not None:
+        return None
+
+    resolved = _resolve_lookup(model, field.source_attrs, relation=True)
+    if resolved is None:
+        return None
+
+    lookup, model_field, nullable = resolved
+    if not model_field.is_relation or (nullable and not field.allow_null):
+        return None
+
+    return lookup, model_field.related_model
+
+
+def _compile_related(field, model, lookups):
+    resolved = _resolve_relation(field, model)
+    if resolved is None:
+        return None
+
+    lookup, related_model = resolved
+    names = list(field.extra_fields)
+    has_display = field.display_field_name not in field.extra_fields
+    if has_display:
+        if not field.display_field:
+            # `str(instance)` needs the model instance
+            return None
+        names.insert(0, field.display_field)
+
+    targets = {}
+    for name in names:
+        resolved = _resolve_lookup(related_model, name.split("."))
+        if resolved is None:
+            return None
+        targets[name] = f"{lookup}__{resolved[0]}"
+
+    lookups.append(lookup)
+    lookups.extend(targets.values())
+    display_lookup = targets[field.display_field] if has_display else None
+    extra_lookups = [(name, targets[name]) for name in field.extra_fields]
+    return _related_getter(field, lookup, display_lookup, extra_lookups)
+
+
+def _compile_pk_related(field, model, lookups):
+    resolved = _resolve_relation(field, model)
+    if resolved is None:
+        return None
+
+    lookups.append(resolved[0])
+    return _value_getter(resolved[0])
+
+
+def _compile_field(field, model, lookups):
+    """
+    Return the getter for one readable field or None if it cannot be compiled.
+    """
+    field_class = type(field)
+    if field_class.to_representation is ComplexPKRelatedField.to_representation:
+        return _compile_related(field, model, lookups)
+
+    if field_class is PrimaryKeyRelatedField:
+        return _compile_pk_related(field, model, lookups)
+
+    if field.source == "*" or isinstance(field, drf_fields.SerializerMethodField):
+        return None
+
+    resolved = _resolve_lookup(model, field.source_attrs)
+    if resolved is None:
+        return None
+
+    lookup, model_field, nullable = resolved
+    if nullable and not field.allow_null:
+        # A missing related object would skip the field instead of returning None
+        return None
+
+    if field_class is DisplayChoiceField:
+        getter = _choice_getter(lookup, field.values_to_choice_strings)
+    elif field_class is drf_fields.ChoiceField:
+        getter = _choice_getter(lookup, field.choice_strings_to_values)
+    elif field_class is drf_fields.ReadOnlyField or isinstance(
+        model_field, PASSTHROUGH_FIELDS.get(field_class, ())
+    ):
+        getter = _value_getter(lookup)
+    elif field_class in CONVERTED_FIELDS:
+        getter = _value_getter(lookup, field.to_representation)
+    else:
+        return None
+
+    lookups.append(lookup)
+    return getter
+
+
+def compile_values_plan(serializer):
+    """
+    Compile the readable fields of a `ModelSerializer` instance into a
+    `ValuesPlan`. Return None when any field cannot be compiled, so the caller
+    falls back to the regular serializer.
+    """
+    meta = getattr(serializer, "Meta", None)
+    model = getattr(meta, "model", None)
+    if model is None:
+        return None
+
+    if type(serializer).to_representation not in PLAIN_REPRESENTATIONS:
+        logger.debug("%s overrides to_representation", type(serializer).__name__)
+        return None
+
+    if getattr(serializer, "_flex_fields_rep_applied", True) is False:
+        # `FlexFieldsSerializerMixin` applies `fields`/`omit` on first representation
+        flex_options = serializer._flex_options_rep_only
+        serializer.apply_flex_fields(serializer.fields, flex_options)
+        serializer._flex_fields_rep_applied = True
+
+    lookups = []
+    columns = []
+    for field in serializer._readable_fields:
+        getter = _compile_field(field, model, lookups)
+        if getter is None:
+            logger.debug(
+                "Field %s.%s cannot be compiled into values()",
+                type(serializer).__name__,
+                field.field_name,
+            )
+            return None
+
+        columns.append((field.field_name, getter))
+
+    if not columns:
+        return None
+
+    return ValuesPlan(list(dict.fromkeys(lookups)), columns)
@@ -2,9 +2,12 @@ from rest_flex_fields.serializers import FlexFieldsSerializerMixin
 from rest_framework.serializers import ModelSerializer
 
 from .fields import ComplexPKRelatedField
+from .mixins import BulkSerializerMixin
 
 
-class WCCModelSerializer(FlexFieldsSerializerMixin, ModelSerializer):
+class WCCModelSerializer(
+    BulkSerializerMixin, FlexFieldsSerializerMixin, ModelSerializer
+):
     serializer_related_field = ComplexPKRelatedField
 
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,244 @@
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DataError
+from django.db.models import Model, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField, RelatedField
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+
+from ..utils import chunked
+from .fields import BatchResolveMixin
+
+__all__ = (
+    "BatchUniqueValidator",
+    "BatchUniqueTogetherValidator",
+    "check_unique_values",
+)
+
+
+def _key(value):
+    # Related objects are compared by primary key, as read from the database
+    return value.pk if isinstance(value, Model) else value
+
+
+class BatchUniqueValidator:
+    """
+    Wraps a `UniqueValidator` to look values up in the results of `check`,
+    one query for the values of many rows, instead of one query per value.
+
+    A value repeating the one of an earlier row fails as well. Values that
+    were not checked are validated by the wrapped validator.
+    """
+
+    requires_context = True
+    # Values checked per query
+    check_batch_size = 500
+
+    def __init__(self, validator):
+        self.validator = validator
+        # Primary keys of the instances holding each checked value
+        self.conflicts = {}
+        self.checked = set()
+        self.seen = set()
+
+    def check(self, values, serializer_field):
+        """
+        Look up which of the values the queryset holds already.
+        """
+        if getattr(self.validator, "lookup", "exact") != "exact":
+            return
+
+        field_name = serializer_field.source_attrs[-1]
+        queryset = self.validator.queryset
+        for chunk in chunked(values, self.check_batch_size):
+            try:
+                rows = list(
+                    queryset.filter(**{f"{field_name}__in": chunk}).values_list(
+                        field_name, "pk"
+                    )
+                )
+            except (TypeError, ValueError, DataError):
+                return
+
+            chunk = set(chunk)
+            for value, pk in rows:
+                if value not in chunk:
+                    # Matched by the database otherwise, e.g. by its collation
+                    self.checked = set()
+                    return
+                self.conflicts.setdefault(value, []).append(pk)
+            self.checked.update(chunk)
+
+    def fail(self):
+        raise ValidationError(self.validator.message, code="unique")
+
+    def __call__(self, value, serializer_field):
+        key = _key(value)
+        try:
+            if key in self.seen:
+                self.fail()
+            self.seen.add(key)
+        except TypeError:
+            return self.validator(value, serializer_field)
+
+        if key not in self.checked:
+            return self.validator(value, serializer_field)
+
+        instance = getattr(serializer_field.parent, "instance", None)
+        for pk in self.conflicts.get(key, ()):
+            if instance is None or pk != instance.pk:
+                self.fail()
+
+
+class BatchUniqueTogetherValidator:
+    """
+    Wraps a `UniqueTogetherValidator` like `BatchUniqueValidator`. Only new
+    rows with all the fields set are looked up in the results of `check`,
+    other rows and conditional constraints are left to the wrapped validator.
+    """
+
+    requires_context = True
+    # Sets of values checked per query
+    check_batch_size = 500
+
+    def __init__(self, validator):
+        self.validator = validator
+        self.conflicts = set()
+        self.checked = set()
+        self.seen = set()
+
+    def get_sources(self, serializer):
+        return [
+            serializer.fields[field_name].source for field_name in self.validator.fields
+        ]
+
+    def check(self, keys, serializer):
+        """
+        Look up which of the sets of values the queryset holds already.
+        """
+        if getattr(self.validator, "condition", None) is not None:
+            return
+
+        sources = self.get_sources(serializer)
+        queryset = self.validator.queryset
+        for chunk in chunked(keys, self.check_batch_size):
+            filters = reduce(or_, (Q(**dict(zip(sources, key))) for key in chunk))
+            try:
+                rows = set(queryset.filter(filters).values_list(*sources))
+            except (TypeError, ValueError, DataError):
+                return
+
+            chunk = set(chunk)
+            if not rows <= chunk:
+                # Matched by the database otherwise, e.g. by its collation
+                self.checked = set()
+                return
+            self.conflicts.update(rows)
+            self.checked.update(chunk)
+
+    def fail(self):
+        validator = self.validator
+        message = validator.message.format(field_names=", ".join(validator.fields))
+        raise ValidationError(message, code=getattr(validator, "code", "unique"))
+
+    def __call__(self, attrs, serializer):
+        sources = self.get_sources(serializer)
+        if serializer.instance is not None or any(
+            attrs.get(source) is None for source in sources
+        ):
+            return self.validator(attrs, serializer)
+
+        key = tuple(_key(attrs[source]) for source in sources)
+        try:
+            if key in self.seen:
+                self.fail()
+            self.seen.add(key)
+        except TypeError:
+            return self.validator(attrs, serializer)
+
+        if key not in self.checked:
+            return self.validator(attrs, serializer)
+        if key in self.conflicts:
+            self.fail()
+
+
+def _to_internal_value(field, data):
+    """
+    Return the validated value of the input of a field, None if invalid.
+    """
+    if data is None:
+        return None
+
+    try:
+        if isinstance(field, RelatedField) and not isinstance(field, BatchResolveMixin):
+            # Looked up one by one, the primary keys are compared instead
+            if not isinstance(field, PrimaryKeyRelatedField) or isinstance(data, bool):
+                return None
+            if field.pk_field is not None:
+                data = field.pk_field.to_internal_value(data)
+            return field.get_queryset().model._meta.pk.to_python(data)
+
+        return _key(field.to_internal_value(data))
+    except (ValidationError, DjangoValidationError, TypeError, ValueError):
+        return None
+
+
+def _hashable(values):
+    keys = set()
+    for value in values:
+        try:
+            keys.add(value)
+        except TypeError:
+            continue
+    return keys
+
+
+def check_unique_values(serializer, items):
+    """
+    Check the values the input items of `serializer` give to unique fields
+    and unique-together sets with a query per constraint, for the validators
+    of the serializer to look them up instead of querying once per item.
+    """
+    items = [item for item in items if isinstance(item, dict)]
+    for field_name, field in serializer.fields.items():
+        if field.read_only or not any(
+            isinstance(validator, (UniqueValidator, BatchUniqueValidator))
+            for validator in field.validators
+        ):
+            continue
+
+        values = _hashable(
+            _to_internal_value(field, item[field_name])
+            for item in items
+            if field_name in item
+        )
+        values.discard(None)
+        validators = []
+        for validator in field.validators:
+            if isinstance(validator, BatchUniqueValidator):
+                validator = validator.validator
+            if isinstance(validator, UniqueValidator):
+                validator = BatchUniqueValidator(validator)
+                validator.check(values, field)
+            validators.append(validator)
+        field.validators = validators
+
+    validators = []
+    for validator in serializer.validators:
+        if isinstance(validator, BatchUniqueTogetherValidator):
+            validator = validator.validator
+        if isinstance(validator, UniqueTogetherValidator):
+            validator = BatchUniqueTogetherValidator(validator)
+            fields = [serializer.fields[name] for name in validator.validator.fields]
+            keys = _hashable(
+                tuple(
+                    _to_internal_value(field, item.get(field.field_name))
+                    for field in fields
+                )
+                for item in items
+            )
+            validator.check([key for key in keys if None not in key], serializer)
+        validators.append(validator)
+    serializer.validators = validators
@@ -3,8 +3,13 @@ import os
 import random
 from collections import OrderedDict
 from datetime import datetime
+from itertools import islice
 
+from django.core.exceptions import FieldDoesNotExist
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import ModelIterable
 from django.db.transaction import atomic
 from django.utils import timezone
 from rest_framework import serializers
@@ -100,3 +105,127 @@ def get_serializer_field(serializer, field_path):
             break
 
     return serializer, source_attrs, is_skipped
+
+
+def chunked(iterable, size):
+    """
+    将可迭代对象按 size 切分为列表, 逐块产出
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _is_keyset_lookup(model, lookup):
+    """
+    判断排序字段能否用于 keyset 分页: 由非空的本表字段或正向外键组成
+    """
+    parts = lookup.split(LOOKUP_SEP)
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return False
+
+        if not field.concrete or field.many_to_many or field.null:
+            return False
+
+        is_last = index == len(parts) - 1
+        if field.is_relation:
+            if is_last:
+                # 按外键排序会使用关联模型的默认排序
+                return part == field.attname
+            model = field.related_model
+        elif not is_last:
+            return False
+
+    return True
+
+
+def get_keyset_ordering(queryset):
+    """
+    获取查询集的 keyset 排序: 以主键结尾的 `(lookup, descending)` 列表,
+    无法用 keyset 条件复现该排序时返回 None
+    """
+    query = queryset.query
+    if (
+        query.is_sliced
+        or query.distinct_fields
+        or query.combinator
+        or queryset._iterable_class is not ModelIterable
+    ):
+        return None
+
+    if query.order_by:
+        ordering = query.order_by
+    elif query.default_ordering:
+        ordering = queryset.model._meta.ordering
+    else:
+        ordering = ()
+
+    pk_name = queryset.model._meta.pk.name
+    keys = []
+    for term in ordering:
+        if not isinstance(term, str) or term == "?":
+            return None
+
+        descending = term.startswith("-")
+        lookup = term[1:] if descending else term
+        if lookup in ("pk", pk_name):
+            # 主键唯一, 后续排序字段不再起作用
+            keys.append(("pk", descending))
+            return keys
+
+        if not _is_keyset_lookup(queryset.model, lookup):
+            return None
+
+        keys.append((lookup, descending))
+
+    keys.append(("pk", False))
+    return keys
+
+
+def queryset_chunks(queryset, size):
+    """
+    将查询集按 size 分块逐块产出模型实例列表
+
+    每块是一次独立查询: 以上一块最后一行的排序字段值及主键作为 keyset 条件,
+    不使用 OFFSET, `select_related`/`prefetch_related` 按块生效。排序无法用
+    keyset 条件复现时(可空字段、表达式排序等)回退到 `queryset.iterator()`。
+    """
+    keys = get_keyset_ordering(queryset)
+    if keys is None:
+        yield from chunked(queryset.iterator(chunk_size=size), size)
+        return
+
+    names = [f"_keyset_{index}" for index in range(len(keys))]
+    queryset = queryset.annotate(
+        **{name: F(lookup) for name, (lookup, _) in zip(names, keys)}
+    ).order_by(*(f"-{lookup}" if desc else lookup for lookup, desc in keys))
+    page = queryset
+    while True:
+        chunk = list(page[:size])
+        if chunk:
+            yield chunk
+        if len(chunk) < size:
+            return
+
+        values = [getattr(chunk[-1], name) for name in names]
+        condition = Q()
+        for index, (lookup, descending) in enumerate(keys):
+            condition |= Q(
+                *((keys[prev][0], values[prev]) for prev in range(index)),
+                (f"{lookup}__{'lt' if descending else 'gt'}", values[index]),
+            )
+        page = queryset.filter(condition)
+
+
+def normalize_query_params(query_params, exclude=()):
+    """
+    规范化查询参数(按参数名排序), 用于生成校验值、缓存键等
+    """
+    return tuple(
+        (key, tuple(query_params.getlist(key)))
+        for key in sorted(query_params)
+        if key not in exclude
+    )
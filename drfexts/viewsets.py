@@ -1,12 +1,80 @@
-from django.core.exceptions import ImproperlyConfigured
-from django.db.models import QuerySet
-from rest_framework.fields import ReadOnlyField
+import calendar
+import functools
+import hashlib
+import posixpath
+import tempfile
+import time
+from itertools import chain
+
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+)
+from django.db import DatabaseError, router, transaction
+from django.db.models import Count, Max, QuerySet
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ParseError, ValidationError
+from rest_framework.fields import BooleanField, ChoiceField, ReadOnlyField
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer, Serializer
+from rest_framework.status import is_success
+from rest_framework.utils import model_meta
 from rest_framework.viewsets import GenericViewSet
 
-from drfexts.renderers import CustomCSVRenderer, CustomXLSXRenderer
+from drfexts.renderers import (
+    BaseArrowRenderer,
+    BaseExportRenderer,
+    CustomArrowRenderer,
+    CustomCSVRenderer,
+    CustomJSONRenderer,
+    CustomNDJSONRenderer,
+    CustomParquetRenderer,
+    CustomXLSXRenderer,
+)
+
+from .cache import (
+    get_cache,
+    get_serializer_models,
+    get_tag_versions,
+    invalidate_model,
+    model_tag,
+    record_cache_event,
+    register_model,
+)
+from .compression import (
+    compress_streaming_response,
+    get_compression_settings,
+    select_encoding,
+)
+from .exports import (
+    SUCCESS,
+    create_export_job,
+    get_export_job,
+    get_export_storage,
+    get_or_create_export_result,
+)
+from .pagination import EXACT
+from .parsers import CustomCSVParser, CustomXLSXParser
+from .serializers.arrow import ArrowBatchBuilder, pa
+from .serializers.fields import DisplayChoiceField
+from .serializers.mixins import get_export_serializer_class, resolve_related_objects
+from .serializers.projection import ValuesListSerializer, compile_values_plan
+from .serializers.validators import check_unique_values
+from .utils import chunked, normalize_query_params, queryset_chunks, strtobool
 
-from .serializers.mixins import ExportSerializerMixin
+# Boolean values as exported
+IMPORT_BOOLEAN_LABELS = {"是": True, "否": False}
 
 
 class EagerLoadingMixin:
@@ -101,9 +169,350 @@ class SelectOnlyMixin:
         return queryset
 
 
+class StreamingListMixin:
+    """
+    Stream `page=all` list responses instead of building them in memory.
+    Cautions:
+        1. Must be placed before `ListModelMixin`.
+        2. Rows are read and serialized `stream_chunk_size` at a time, so the
+        memory used no longer grows with the size of the queryset.
+    """
+
+    stream_chunk_size = 2000
+
+    def should_stream(self, request) -> bool:
+        """
+        Return True if the list response should be streamed.
+        """
+        paginator = self.paginator  # noqa
+        if paginator is None or not hasattr(paginator, "get_stream_extra"):
+            return False
+
+        renderer = getattr(request, "accepted_renderer", None)
+        if not isinstance(renderer, CustomJSONRenderer):
+            return False
+
+        return request.query_params.get(paginator.page_query_param) == "all"
+
+    def iter_serialized_chunks(self, queryset):
+        """
+        Serialize the queryset chunk by chunk.
+        """
+        if isinstance(queryset, QuerySet):
+            chunks = queryset_chunks(queryset, self.stream_chunk_size)
+        else:
+            chunks = chunked(queryset, self.stream_chunk_size)
+
+        # One serializer for all chunks, so fields like `SequenceField` keep counting
+        serializer = self.get_serializer(many=True)  # noqa
+        for chunk in chunks:
+            yield serializer.to_representation(chunk)
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream(request):
+            return super().list(request, *args, **kwargs)  # noqa
+
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        renderer = request.accepted_renderer
+        content = renderer.render_stream(
+            self.iter_serialized_chunks(queryset),
+            extra=self.paginator.get_stream_extra,  # noqa
+            renderer_context=self.get_renderer_context(),  # noqa
+        )
+        response = StreamingHttpResponse(content, content_type=renderer.media_type)
+        return compress_streaming_response(response, request)
+
+
+class _EarlyResponse(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Answer unchanged list/retrieve requests with `304 Not Modified`.
+
+    The ETag is built from a single aggregate query over the filtered
+    queryset (`Max(last_modified_field)` and `Count`), the normalized query
+    params, the accepted media type and the user, so matching requests skip
+    the page query, serialization and rendering. It is weak for compressed
+    responses.
+
+    It can be combined with `CacheResponseMixin` in either order, matching
+    requests get a 304 rather than the cached response.
+    """
+
+    conditional_actions = ("list", "retrieve")
+    last_modified_field = "updated_at"
+
+    def get_conditional_queryset(self):
+        """
+        Return the queryset the validators are computed on.
+        """
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        if self.action == "retrieve":  # noqa
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field  # noqa
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}  # noqa
+            )
+
+        return queryset
+
+    def get_conditional_validators(self, request):
+        """
+        Return `(etag, last_modified)` for the current request, or None.
+        """
+        if request.method not in ("GET", "HEAD"):
+            return None
+
+        if self.action not in self.conditional_actions:  # noqa
+            return None
+
+        queryset = self.get_conditional_queryset()
+        if not isinstance(queryset, QuerySet):
+            return None
+
+        try:
+            queryset.model._meta.get_field(self.last_modified_field)
+        except FieldDoesNotExist:
+            return None
+
+        aggregates = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field), count=Count("pk")
+        )
+        last_modified = aggregates["last_modified"]
+        user = getattr(request, "user", None)
+        key = repr(
+            (
+                last_modified.isoformat() if last_modified else None,
+                aggregates["count"],
+                sorted(self.kwargs.items()),  # noqa
+                normalize_query_params(request.query_params),
+                getattr(request, "accepted_media_type", None),
+                getattr(user, "pk", None),
+            )
+        )
+        etag = quote_etag(hashlib.sha1(key.encode()).hexdigest())
+        if last_modified is not None:
+            last_modified = calendar.timegm(last_modified.utctimetuple())
+
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        early_response = None
+        try:
+            super().initial(request, *args, **kwargs)  # noqa
+        except _EarlyResponse as exc:
+            # e.g. a hit of `CacheResponseMixin` placed after this mixin, still
+            # answered with 304 when it matches the request validators
+            early_response = exc
+
+        self._conditional_validators = self.get_conditional_validators(request)
+        if self._conditional_validators is not None:
+            etag, last_modified = self._conditional_validators
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                raise _EarlyResponse(self.set_conditional_headers(response))
+
+        if early_response is not None:
+            raise early_response
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _EarlyResponse):
+            return exc.response
+
+        return super().handle_exception(exc)  # noqa
+
+    def set_conditional_headers(self, response):
+        """
+        Add the ETag and Last-Modified headers to the response.
+        """
+        etag, last_modified = self._conditional_validators
+        # Encoded before the validators were set, e.g. a cached response
+        if response.has_header("Content-Encoding") and not etag.startswith("W/"):
+            etag = f"W/{etag}"
+        response.setdefault("ETag", etag)
+        if last_modified is not None:
+            response.setdefault("Last-Modified", http_date(last_modified))
+
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)  # noqa
+        if getattr(self, "_conditional_validators", None) and is_success(
+            response.status_code
+        ):
+            self.set_conditional_headers(response)
+
+        return response
+
+
+class CacheResponseMixin:
+    """
+    Cache the bytes rendered by `CustomJSONRenderer` for list/retrieve.
+
+    Entries are keyed by view, action, URL kwargs, normalized query params,
+    accepted media type, negotiated content encoding and `get_cache_scope()`,
+    and are tagged with the models the serializer reads. Saving or deleting
+    those models, or changing them through `StatusQuerySet`, invalidates the
+    entries once committed, see `drfexts.cache`.
+    Cautions:
+        1. Models only reachable through `SerializerMethodField` or custom
+        querysets must be listed in `cache_tag_models`.
+    """
+
+    cache_actions = ("list", "retrieve")
+    cache_timeout = 300
+    cache_tag_models = ()
+    cached_headers = ("Content-Type", "Content-Encoding", "Content-Disposition", "Vary")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Hook deletes at import time, in every process loading the view
+        queryset = getattr(cls, "queryset", None)
+        models = list(cls.cache_tag_models)
+        if isinstance(queryset, QuerySet):
+            models.append(queryset.model)
+            models.extend(
+                field.related_model
+                for field in queryset.model._meta.get_fields()
+                if field.is_relation and field.concrete and field.related_model
+            )
+
+        for model in models:
+            register_model(model)
+
+    @classmethod
+    def get_cache_namespace(cls):
+        return f"{cls.__module__}.{cls.__qualname__}"
+
+    def get_cache_scope(self, request):
+        """
+        Return the scope sharing cache entries, the user by default.
+        """
+        return getattr(getattr(request, "user", None), "pk", None)
+
+    def get_cache_tag_models(self):
+        """
+        Return the models the cached response depends on.
+        """
+        models = get_serializer_models(self.get_serializer())  # noqa
+        models.update(self.cache_tag_models)
+        queryset = self.get_queryset()  # noqa
+        if isinstance(queryset, QuerySet):
+            models.add(queryset.model)
+
+        return models
+
+    def get_cache_key(self, request):
+        models = self.get_cache_tag_models()
+        for model in models:
+            register_model(model)
+
+        compression_settings = get_compression_settings()
+        encoding = compression_settings and select_encoding(
+            request, compression_settings["ENCODINGS"]
+        )
+        key = repr(
+            (
+                self.get_cache_namespace(),
+                self.action,  # noqa
+                sorted(self.kwargs.items()),  # noqa
+                normalize_query_params(request.query_params),
+                request.accepted_media_type,
+                encoding,
+                self.get_cache_scope(request),
+                get_tag_versions(model_tag(model) for model in models),
+            )
+        )
+        return f"drfexts:response:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # noqa
+        self._cache_key = None
+        self._cached_response = None
+        if request.method not in ("GET", "HEAD"):
+            return
+
+        if self.action not in self.cache_actions:  # noqa
+            return
+
+        renderer = getattr(request, "accepted_renderer", None)
+        if not isinstance(renderer, CustomJSONRenderer):
+            return
+
+        cache_key = self.get_cache_key(request)
+        entry = get_cache().get(cache_key)
+        if entry is not None:
+            content, headers = entry
+            self._cached_response = HttpResponse(content, headers=headers)
+            raise _EarlyResponse(self._cached_response)
+
+        self._cache_key = cache_key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _EarlyResponse):
+            return exc.response
+
+        return super().handle_exception(exc)  # noqa
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)  # noqa
+        # Counted once served, a 304 of `ConditionalGetMixin` is neither
+        namespace = self.get_cache_namespace()
+        if response is getattr(self, "_cached_response", None):
+            record_cache_event(namespace, "hit")
+
+        cache_key = getattr(self, "_cache_key", None)
+        if (
+            cache_key
+            and isinstance(response, Response)
+            and is_success(response.status_code)
+        ):
+            response.render()
+            headers = {
+                header: response[header]
+                for header in self.cached_headers
+                if response.has_header(header)
+            }
+            get_cache().set(cache_key, (response.content, headers), self.cache_timeout)
+            record_cache_event(namespace, "miss")
+
+        return response
+
+
+class PaginationCountMixin:
+    """
+    Add a `count` action returning the exact total of the filtered list.
+
+    It is the follow-up of the `deferred` count strategy of `CustomPagination`,
+    whose pages link it as `count_url`. The total is cached per filter set, so
+    the next pages report it as a `cached` total.
+    """
+
+    @action(detail=False, methods=["get"], url_path="count")
+    def count(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        paginator = self.paginator  # noqa
+        if hasattr(paginator, "get_exact_count") and isinstance(queryset, QuerySet):
+            total = paginator.get_exact_count(queryset)
+        elif isinstance(queryset, QuerySet):
+            total = queryset.count()
+        else:
+            total = len(queryset)
+
+        return Response({"total": total, "total_type": EXACT})
+
+
 class ExtGenericViewSet(GenericViewSet):
     _default_key = "default"
     queryset_function_name = "process_queryset"
+    # Serialize list actions from `queryset.values()` rows instead of model
+    # instances. Falls back automatically if a field cannot be compiled.
+    values_projection = False
     # The filter backend classes to use for queryset filtering
 
     def get_serializer_class(self):
@@ -125,10 +534,38 @@ class ExtGenericViewSet(GenericViewSet):
 
         return self.serializer_class
 
+    def get_values_plan(self):
+        """
+        Return the compiled `values()` plan of the list serializer, if any.
+        """
+        if not self.values_projection or self.action != "list":
+            return None
+
+        if not hasattr(self, "_values_plan"):
+            self._values_plan = compile_values_plan(self.get_serializer())
+
+        return self._values_plan
+
+    def filter_queryset(self, queryset):
+        """
+        Project the filtered queryset when the values plan is used.
+        """
+        queryset = super().filter_queryset(queryset)
+        plan = self.get_values_plan()
+        if plan is not None and isinstance(queryset, QuerySet):
+            queryset = plan.project(queryset)
+
+        return queryset
+
     def get_serializer(self, *args, **kwargs):
         """
         支持动态设置序列化器字段
         """
+        if kwargs.get("many"):
+            plan = self.get_values_plan()
+            if plan is not None:
+                return ValuesListSerializer(plan, *args)
+
         serializer_class = self.get_serializer_class()
         if hasattr(serializer_class, "get_included_fields") and callable(
             serializer_class.get_included_fields
@@ -191,11 +628,29 @@ class ExtGenericViewSet(GenericViewSet):
 
 class ExportMixin:
     """
-    Export data to csv/xlsx file
+    Export data to csv/xlsx/ndjson file, or arrow/parquet file if pyarrow is installed
+    Cautions:
+        1. Must be placed before `ListModelMixin` for files to be built from the
+        queryset `export_chunk_size` rows at a time. csv and ndjson files are
+        streamed, xlsx files are written to a temporary file first.
+        2. With `?async=true` the export runs in the background, see
+        `drfexts.exports`. Poll `export-jobs/<job_id>/` for its status and get
+        the file from `export-jobs/<job_id>/download/`.
+        3. With `export_cache_timeout` set, export files are stored and reused
+        by identical requests until the data changes. The key covers the SQL
+        of the filtered queryset but not the user, override
+        `get_export_cache_scope()` if the serializer output depends on them.
     """
 
     export_actions = ["list"]
     default_base_filename = "export"
+    export_chunk_size = 5000
+    export_async_param = "async"
+    # Redirect downloads of background exports to the storage URL
+    export_download_redirect = False
+    # Seconds an export file is reused, None disables the export cache
+    export_cache_timeout = None
+    export_last_modified_field = "updated_at"
 
     def is_export_action(self) -> bool:
         """
@@ -209,6 +664,9 @@ class ExportMixin:
             (
                 "text/csv",
                 "application/xlsx",
+                CustomNDJSONRenderer.media_type,
+                CustomArrowRenderer.media_type,
+                CustomParquetRenderer.media_type,
             )
         )
 
@@ -218,10 +676,311 @@ class ExportMixin:
         """
         renderers = super().get_renderers()  # noqa
         if self.action in self.export_actions:  # noqa
-            return renderers + [CustomCSVRenderer(), CustomXLSXRenderer()]
+            renderers = renderers + [
+                CustomCSVRenderer(),
+                CustomXLSXRenderer(),
+                CustomNDJSONRenderer(),
+            ]
+            if pa is not None:
+                renderers += [CustomArrowRenderer(), CustomParquetRenderer()]
 
         return renderers
 
+    def get_export_instances(self, queryset):
+        """
+        Return the current page, or the whole queryset read in chunks.
+        """
+        # `CustomPagination` would load the whole queryset for page=all
+        page_query_param = getattr(self.paginator, "page_query_param", None)  # noqa
+        if self.request.query_params.get(page_query_param) != "all":  # noqa
+            page = self.paginate_queryset(queryset)  # noqa
+            if page is not None:
+                return page
+
+        if isinstance(queryset, QuerySet):
+            return chain.from_iterable(queryset_chunks(queryset, self.export_chunk_size))
+
+        return queryset
+
+    def is_chunked_export(self, renderer, writer_opts) -> bool:
+        """
+        Return True if the export is built from the queryset in chunks.
+        """
+        if isinstance(renderer, CustomXLSXRenderer):
+            return writer_opts.get("write_only", renderer.write_only)
+
+        return isinstance(
+            renderer, (CustomCSVRenderer, CustomNDJSONRenderer, BaseArrowRenderer)
+        )
+
+    def is_async_export(self) -> bool:
+        """
+        Return True if the export should run as a background job.
+        """
+        value = self.request.query_params.get(self.export_async_param)  # noqa
+        try:
+            return bool(value) and strtobool(value)
+        except ValueError:
+            return False
+
+    def iter_export_chunks(self, instances, serializer, renderer=None):
+        """
+        Serialize the instances `export_chunk_size` at a time, into row
+        batches built column by column if the renderer takes them.
+        """
+        to_chunk = serializer.to_representation
+        child = getattr(serializer, "child", None)
+        if (
+            isinstance(renderer, BaseExportRenderer)
+            and renderer.accepts_row_batches()
+            and hasattr(child, "to_rows")
+        ):
+            to_chunk = child.to_rows
+
+        for chunk in chunked(instances, self.export_chunk_size):
+            yield to_chunk(chunk)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Stream csv/ndjson exports, write xlsx exports to a temporary file and
+        build arrow/parquet exports as record batches, `export_chunk_size` rows
+        at a time.
+        """
+        renderer = getattr(request, "accepted_renderer", None)
+        writer_opts = self.get_renderer_context().get("writer_opts", {})
+        if self.is_export_action() and self.is_async_export():
+            return self.start_export_job(renderer, writer_opts)
+
+        if self.export_cache_timeout and self.is_export_action():
+            response = self.get_cached_export_response(renderer, writer_opts)
+            if response is not None:
+                return response
+
+        if not self.is_chunked_export(renderer, writer_opts):
+            return super().list(request, *args, **kwargs)  # noqa
+
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        instances = self.get_export_instances(queryset)
+        serializer = self.get_serializer(many=True)  # noqa
+        if isinstance(renderer, BaseArrowRenderer):
+            builder = ArrowBatchBuilder(serializer.child)
+            return Response(builder.stream(instances, self.export_chunk_size))
+
+        chunks = self.iter_export_chunks(instances, serializer, renderer)
+        if isinstance(renderer, CustomXLSXRenderer):
+            file = renderer.render_to_file(chunks, writer_opts)
+            response = FileResponse(file, content_type=renderer.media_type)
+            renderer.set_content_disposition(response, writer_opts)
+            return response
+
+        response = StreamingHttpResponse(
+            renderer.render_stream(chunks, writer_opts),
+            content_type=self.get_export_content_type(renderer, writer_opts),
+        )
+        renderer.set_content_disposition(response, writer_opts)
+        return compress_streaming_response(response, request)
+
+    def get_export_content_type(self, renderer, writer_opts):
+        content_type = renderer.media_type
+        charset = writer_opts.get("charset", renderer.charset)
+        if charset:
+            content_type = f"{content_type}; charset={charset}"
+
+        return content_type
+
+    def get_export_cache_scope(self):
+        """
+        Return the scope sharing export files, every user by default.
+        """
+        return None
+
+    def get_export_data_version(self, queryset):
+        """
+        Return a value changing whenever the exported data changes: the row
+        count and latest `export_last_modified_field` of the queryset, and the
+        tag versions of the models the serializer reads.
+        """
+        aggregates = {"count": Count("pk")}
+        try:
+            queryset.model._meta.get_field(self.export_last_modified_field)
+        except FieldDoesNotExist:
+            pass
+        else:
+            aggregates["last_modified"] = Max(self.export_last_modified_field)
+
+        values = queryset.order_by().aggregate(**aggregates)
+        models = get_serializer_models(self.get_serializer())  # noqa
+        models.add(queryset.model)
+        for model in models:
+            register_model(model)
+
+        return (
+            values["count"],
+            str(values.get("last_modified")),
+            get_tag_versions(model_tag(model) for model in models),
+        )
+
+    def get_export_fingerprint(self, queryset):
+        """
+        Return the key of the export file of the current request.
+        """
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            sql = None
+
+        key = repr(
+            (
+                f"{type(self).__module__}.{type(self).__qualname__}",
+                sorted(self.kwargs.items()),  # noqa
+                normalize_query_params(self.request.query_params),  # noqa
+                self.request.accepted_media_type,  # noqa
+                self.get_export_cache_scope(),
+                sql,
+                self.get_export_data_version(queryset),
+            )
+        )
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get_cached_export_response(self, renderer, writer_opts):
+        """
+        Serve the stored export file of an identical request, writing it first
+        if needed. Return None to export without the cache.
+        """
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        if not isinstance(queryset, QuerySet):
+            return None
+
+        fingerprint = self.get_export_fingerprint(queryset)
+        namespace = f"{type(self).__module__}.{type(self).__qualname__}:export"
+        written = []
+
+        def write_file():
+            written.append(fingerprint)
+            instances = self.get_export_instances(queryset)
+            serializer = self.get_serializer(many=True)  # noqa
+            return self.write_export_file(renderer, instances, serializer, writer_opts)
+
+        name = get_or_create_export_result(
+            fingerprint,
+            writer_opts.get("filename") or self.get_export_filename(),
+            write_file,
+            self.export_cache_timeout,
+        )
+        record_cache_event(namespace, "miss" if written else "hit")
+        try:
+            file = get_export_storage().open(name, "rb")
+        except FileNotFoundError:
+            return None
+
+        response = FileResponse(
+            file, content_type=self.get_export_content_type(renderer, writer_opts)
+        )
+        renderer.set_content_disposition(response, writer_opts)
+        if not renderer.compressible:
+            return response
+
+        return compress_streaming_response(response, self.request)  # noqa
+
+    def write_export_file(self, renderer, queryset, serializer, writer_opts):
+        """
+        Write the whole export into a temporary file and return the file,
+        positioned at its start.
+        """
+        instances = queryset
+        if isinstance(queryset, QuerySet):
+            instances = chain.from_iterable(
+                queryset_chunks(queryset, self.export_chunk_size)
+            )
+
+        if isinstance(renderer, CustomXLSXRenderer):
+            chunks = self.iter_export_chunks(instances, serializer, renderer)
+            return renderer.render_to_file(chunks, writer_opts)
+
+        file = tempfile.TemporaryFile()
+        if isinstance(renderer, BaseArrowRenderer):
+            builder = ArrowBatchBuilder(serializer.child)
+            renderer.write_batches(
+                file, builder.stream(instances, self.export_chunk_size)
+            )
+        else:
+            chunks = self.iter_export_chunks(instances, serializer, renderer)
+            for content in renderer.render_stream(chunks, writer_opts):
+                file.write(content)
+
+        file.seek(0)
+        return file
+
+    def start_export_job(self, renderer, writer_opts):
+        """
+        Create a background job exporting the filtered queryset, with the
+        fields resolved by this request.
+        """
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        serializer = self.get_serializer(many=True)  # noqa
+        write_file = functools.partial(
+            self.write_export_file, renderer, queryset, serializer, writer_opts
+        )
+        job = create_export_job(
+            self.request.user,  # noqa
+            renderer.format,
+            writer_opts.get("filename") or self.get_export_filename(),
+            write_file,
+        )
+
+        # The job is described with the default renderer, not the export one
+        json_renderer = super().get_renderers()[0]  # noqa
+        self.request.accepted_renderer = json_renderer  # noqa
+        self.request.accepted_media_type = json_renderer.media_type  # noqa
+        return Response(self.get_export_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+    def get_export_job_data(self, job):
+        return {
+            key: job[key]
+            for key in (
+                "id",
+                "status",
+                "format",
+                "filename",
+                "error",
+                "created_at",
+                "finished_at",
+            )
+        }
+
+    def get_export_job_or_404(self, job_id):
+        job = get_export_job(job_id)
+        if job is None or job["user"] != getattr(self.request.user, "pk", None):  # noqa
+            raise NotFound()
+
+        return job
+
+    @action(detail=False, url_path=r"export-jobs/(?P<job_id>[0-9a-f]{32})")
+    def export_job(self, request, job_id=None):
+        """
+        Return the status of a background export.
+        """
+        return Response(self.get_export_job_data(self.get_export_job_or_404(job_id)))
+
+    @action(detail=False, url_path=r"export-jobs/(?P<job_id>[0-9a-f]{32})/download")
+    def download_export_job(self, request, job_id=None):
+        """
+        Download the file of a finished background export.
+        """
+        job = self.get_export_job_or_404(job_id)
+        if job["status"] != SUCCESS:
+            raise NotFound(f"Export job is {job['status']}.")
+
+        storage = get_export_storage()
+        if self.export_download_redirect:
+            return HttpResponseRedirect(storage.url(job["storage_name"]))
+
+        return FileResponse(
+            storage.open(job["storage_name"], "rb"),
+            as_attachment=True,
+            filename=job["filename"],
+        )
+
     def get_serializer_class(self):
         """
         Return the class to use for the serializer.
@@ -229,11 +988,7 @@ class ExportMixin:
         """
         serializer_class = super().get_serializer_class()  # noqa
         if self.is_export_action():
-
-            class ExportSerializer(ExportSerializerMixin, serializer_class):
-                ...
-
-            return ExportSerializer
+            return get_export_serializer_class(serializer_class)
 
         return serializer_class
 
@@ -257,4 +1012,283 @@ class ExportMixin:
         if "filename" in self.request.query_params:  # noqa
             return self.request.query_params["filename"]  # noqa
 
-        return f"{self.default_base_filename}.csv"
+        renderer = getattr(self.request, "accepted_renderer", None)  # noqa
+        export_format = getattr(renderer, "format", "csv")
+        return f"{self.default_base_filename}.{export_format}"
+
+
+class ImportMixin:
+    """
+    Bulk import csv/xlsx files through the serializer of the viewset.
+
+    `POST <prefix>/import/` with the file as the request body, or as the
+    `import_file_field` of a multipart form. The header row holds field labels
+    (as exported) or field names. Rows are validated and saved
+    `import_batch_size` at a time, each batch with `bulk_create` and
+    `bulk_update` in its own transaction. The response reports the rows that
+    failed and the throughput.
+
+    With `import_max_rows`, the rows of the file are counted before any batch
+    is saved, nothing is saved from a file with more rows.
+    Cautions:
+        1. Model `save()` and the `pre_save`/`post_save` signals are not called.
+        2. With `import_lookup_field`, rows matching an instance of the queryset
+        on that field update it instead of creating a new one.
+    """
+
+    import_batch_size = 1000
+    # Reject files with more rows, None for no limit
+    import_max_rows = None
+    import_lookup_field = None
+    import_file_field = "file"
+    # Encoding of csv files, the request encoding by default
+    import_encoding = None
+    # Sheet of xlsx files, a name or an index, the active one by default
+    import_sheet = None
+    # Query parameter naming the sheet to import
+    import_sheet_param = "sheet"
+    import_parsers = {"csv": CustomCSVParser, "xlsx": CustomXLSXParser}
+
+    def get_import_parser_context(self, request):
+        parser_context = {
+            "batches": True,
+            "batch_size": self.import_batch_size,
+            "max_rows": self.import_max_rows,
+            # The other columns of the file are not read
+            "columns": set(self.get_import_columns(self.get_serializer())),  # noqa
+        }
+        if self.import_encoding:
+            parser_context["encoding"] = self.import_encoding
+
+        sheet = request.query_params.get(self.import_sheet_param, self.import_sheet)
+        if sheet is not None:
+            parser_context["sheet"] = sheet
+
+        return parser_context
+
+    def get_import_batches(self, request):
+        """
+        Return an iterator over the batches of rows of the uploaded file.
+        """
+        parser_context = self.get_import_parser_context(request)
+        if not request.content_type.startswith("multipart/"):
+            request.parser_context.update(parser_context)
+            return request.data
+
+        file = request.FILES.get(self.import_file_field)
+        if file is None:
+            raise ValidationError({self.import_file_field: ["No file was submitted."]})
+
+        extension = posixpath.splitext(file.name)[1].lstrip(".").lower()
+        parser_class = self.import_parsers.get(extension)
+        if parser_class is None:
+            raise ValidationError(
+                {self.import_file_field: [f"Unsupported file type: {file.name}"]}
+            )
+
+        parser_context = {**request.parser_context, **parser_context}
+        return parser_class().parse(file, parser_context=parser_context)
+
+    def get_import_translation(self, field):
+        """
+        Return the function converting exported values back, e.g. choice
+        labels to choice values, or None.
+        """
+        if isinstance(field, DisplayChoiceField):
+            return None
+
+        if isinstance(field, ChoiceField):
+            values = {str(label): value for value, label in field.choices.items()}
+            return lambda value: values.get(str(value), value)
+
+        if isinstance(field, BooleanField):
+            return lambda value: IMPORT_BOOLEAN_LABELS.get(value, value)
+
+        return None
+
+    def get_import_columns(self, serializer):
+        """
+        Map the headers accepted in the file, field labels and names, to the
+        field name and value translation of each writable field.
+        """
+        fields = [
+            (field_name, field, self.get_import_translation(field))
+            for field_name, field in serializer.fields.items()
+            if not field.read_only or field_name == self.import_lookup_field
+        ]
+        columns = {str(field.label): (name, trans) for name, field, trans in fields}
+        columns.update((name, (name, trans)) for name, _, trans in fields)
+        return columns
+
+    def to_import_data(self, row, columns):
+        """
+        Convert a parsed row to the data of the serializer. Empty cells are
+        left out so that fields take their default or keep their value.
+        """
+        data = {}
+        for header, value in row.items():
+            column = columns.get(header)
+            if column is None or value is None:
+                continue
+            if isinstance(value, str) and not value.strip():
+                continue
+
+            field_name, translate = column
+            data[field_name] = value if translate is None else translate(value)
+
+        return data
+
+    def get_import_instances(self, items):
+        """
+        Return the instances of the queryset the items update, by the string
+        value of their `import_lookup_field`.
+        """
+        lookup = self.import_lookup_field
+        if not lookup:
+            return {}
+
+        values = {item[lookup] for item in items if lookup in item}
+        if not values:
+            return {}
+
+        queryset = self.get_queryset().filter(**{f"{lookup}__in": values})  # noqa
+        return {str(getattr(instance, lookup)): instance for instance in queryset}
+
+    def build_import_instance(self, model, validated_data, instance=None):
+        """
+        Apply validated data to a new or existing instance without saving it.
+        Return the instance and its many-to-many values.
+        """
+        relations = model_meta.get_field_info(model).relations
+        many_to_many = {
+            name: validated_data.pop(name)
+            for name, relation in relations.items()
+            if relation.to_many and name in validated_data
+        }
+        if instance is None:
+            return model(**validated_data), many_to_many
+
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return instance, many_to_many
+
+    def save_import_batch(self, model, created, updated, update_fields):
+        """
+        Save the instances of one batch, in one transaction.
+        """
+        if updated:
+            # `bulk_update` does not call `pre_save`, e.g. for `auto_now` fields
+            for field in model._meta.concrete_fields:
+                if getattr(field, "auto_now", False) or getattr(
+                    field, "on_update", False
+                ):
+                    for instance, _ in updated:
+                        field.pre_save(instance, False)
+                    update_fields.add(field.name)
+
+        using = router.db_for_write(model)
+        with transaction.atomic(using=using):
+            model.objects.bulk_create([instance for instance, _ in created])
+            if updated:
+                model.objects.bulk_update(
+                    [instance for instance, _ in updated], update_fields
+                )
+            for instance, many_to_many in chain(created, updated):
+                for name, value in many_to_many.items():
+                    getattr(instance, name).set(value)
+            # `bulk_create` and `bulk_update` send no signals
+            invalidate_model(model, using)
+
+    def import_batch(self, rows, first_row, report):
+        """
+        Validate and save one batch of parsed rows into the report.
+        """
+        create_serializer = self.get_serializer()  # noqa
+        update_serializer = self.get_serializer(partial=True)  # noqa
+        model = create_serializer.Meta.model
+        columns = self.get_import_columns(create_serializer)
+        items = [self.to_import_data(row, columns) for row in rows]
+        instances = self.get_import_instances(items)
+        lookup = self.import_lookup_field
+        targets = [
+            instances.get(str(item[lookup])) if lookup in item else None
+            for item in items
+        ]
+        # One query per related field, or unique constraint, and batch instead of
+        # one per row
+        pairs = list(zip(items, targets))
+        for serializer, batch in (
+            (create_serializer, [item for item, target in pairs if target is None]),
+            (update_serializer, [item for item, target in pairs if target is not None]),
+        ):
+            resolve_related_objects(serializer, batch)
+            check_unique_values(serializer, batch)
+
+        created, updated, update_fields, row_numbers = [], [], set(), []
+        for row_number, (item, instance) in enumerate(pairs, first_row):
+            serializer = create_serializer if instance is None else update_serializer
+            serializer.instance = instance
+            try:
+                validated_data = serializer.run_validation(item)
+            except ValidationError as exc:
+                report["errors"].append({"row": row_number, "errors": exc.detail})
+                continue
+
+            instance, many_to_many = self.build_import_instance(
+                model, validated_data, instance
+            )
+            if serializer is create_serializer:
+                created.append((instance, many_to_many))
+            else:
+                updated.append((instance, many_to_many))
+                update_fields.update(validated_data)
+            row_numbers.append(row_number)
+
+        try:
+            self.save_import_batch(model, created, updated, update_fields)
+        except DatabaseError as exc:
+            report["errors"].extend(
+                {"row": row_number, "errors": {"non_field_errors": [str(exc)]}}
+                for row_number in row_numbers
+            )
+        else:
+            report["created"] += len(created)
+            report["updated"] += len(updated)
+
+    def import_batches(self, request, report):
+        """
+        Import the batches of the uploaded file into the report.
+        """
+        # Rows are numbered as in the file, after the header row
+        first_row = 2
+        for rows in self.get_import_batches(request):
+            self.import_batch(rows, first_row, report)
+            first_row += len(rows)
+            report["total"] += len(rows)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=[CustomCSVParser, CustomXLSXParser, MultiPartParser],
+    )
+    def import_data(self, request, *args, **kwargs):
+        """
+        Import the rows of a csv/xlsx file in batches.
+        """
+        started = time.perf_counter()
+        report = {"total": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+        response_status = status.HTTP_200_OK
+        try:
+            self.import_batches(request, report)
+        except ParseError as exc:
+            # The batches before the error are kept, there are none when the
+            # file exceeds `import_max_rows`
+            report["error"] = exc.detail
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        elapsed = time.perf_counter() - started
+        report["failed"] = len(report["errors"])
+        report["elapsed"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["total"] / elapsed) if elapsed else 0
+        return Response(report, status=response_status)
@@ -0,0 +1,661 @@
+"""
+Minimal xlsx writer and reader for very large exports and imports.
+
+Rows are encoded into worksheet XML block by block, optionally by a pool of
+worker processes, and written into the workbook zip in order. Strings are
+stored inline, so no shared-strings table has to be kept across blocks or
+processes. A new sheet is started whenever one reaches the Excel row limit.
+
+The reader streams the rows of one sheet and only converts the cells of the
+columns it is asked for.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from itertools import islice
+from multiprocessing.spawn import get_executable
+from xml.etree.ElementTree import fromstring as parse_xml_string
+from xml.etree.ElementTree import parse as parse_xml
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles import Alignment, PatternFill
+from openpyxl.styles.borders import Border
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.styles.numbers import (
+    BUILTIN_FORMATS,
+    is_date_format,
+    is_timedelta_format,
+)
+from openpyxl.utils.cell import (
+    column_index_from_string,
+    coordinate_from_string,
+    get_column_letter,
+)
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904,
+    CALENDAR_WINDOWS_1900,
+    from_excel,
+    from_ISO8601,
+)
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.xml.functions import tostring
+
+__all__ = ["MAX_SHEET_ROWS", "XLSXReader", "XLSXWriter", "render_rows"]
+
+logger = logging.getLogger(__name__)
+
+# Rows per sheet supported by Excel
+MAX_SHEET_ROWS = 1048576
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+HEADER_STYLE = 1
+
+WORKSHEET_RE = re.compile(rb"<(?P<prefix>[\w.-]+:)?worksheet\b[^>]*>")
+SHEET_DATA_RE = re.compile(rb"<(?:[\w.-]+:)?sheetData\b[^>]*?(?P<empty>/)?>")
+VALUE_TAG = f"{{{MAIN_NS}}}v"
+INLINE_STRING_TAG = f"{{{MAIN_NS}}}is"
+TEXT_TAG = f"{{{MAIN_NS}}}t"
+RUN_TAG = f"{{{MAIN_NS}}}r"
+
+
+def render_cell(reference, value, style=None):
+    style = f' s="{style}"' if style else ""
+    if value is None:
+        return f'<c r="{reference}"{style}/>' if style else ""
+
+    if isinstance(value, bool):
+        return f'<c r="{reference}"{style} t="b"><v>{int(value)}</v></c>'
+
+    if isinstance(value, (int, float, Decimal)) and math.isfinite(value):
+        return f'<c r="{reference}"{style}><v>{value}</v></c>'
+
+    value = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+
+    return (
+        f'<c r="{reference}"{style} t="inlineStr">'
+        f'<is><t xml:space="preserve">{escape(value)}</t></is></c>'
+    )
+
+
+def render_rows(rows, first_row, style=None, height=None):
+    """
+    Encode rows into `<row>` elements, numbering them from `first_row`.
+    Runs in the worker processes.
+    """
+    height = f' ht="{height}" customHeight="1"' if height else ""
+    parts = []
+    for row_index, row in enumerate(rows, first_row):
+        parts.append(f'<row r="{row_index}"{height}>')
+        for column, value in enumerate(row, 1):
+            reference = f"{get_column_letter(column)}{row_index}"
+            parts.append(render_cell(reference, value, style))
+        parts.append("</row>")
+
+    return "".join(parts).encode()
+
+
+def _to_xml(*styles):
+    return "".join(tostring(style.to_tree()).decode() for style in styles)
+
+
+# Process pools shared by all exports, by start method and size
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def can_start_processes(start_method):
+    """
+    Return True if worker processes can be started with `start_method`.
+
+    `spawn` and `forkserver` run the interpreter of
+    `multiprocessing.set_executable()`, `sys.executable` by default, which
+    is not Python when embedded, e.g. under uWSGI.
+    """
+    if start_method == "fork":
+        return True
+
+    executable = os.path.basename(os.fsdecode(get_executable()))
+    return executable.lower().startswith(("python", "pypy"))
+
+
+def get_process_pool(processes, start_method):
+    """
+    Return the shared pool of `processes` workers started with
+    `start_method`, creating it on first use.
+    """
+    key = (start_method, processes)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            context = multiprocessing.get_context(start_method)
+            pool = _pools[key] = ProcessPoolExecutor(processes, mp_context=context)
+        return pool
+
+
+def _discard_process_pool(pool):
+    with _pools_lock:
+        for key, value in list(_pools.items()):
+            if value is pool:
+                del _pools[key]
+    pool.shutdown(wait=False)
+
+
+def _bounded_map(executor, fn, blocks, window):
+    """
+    Like `executor.map`, but only keeps `window` blocks in flight.
+    """
+    pending = deque()
+    for block in blocks:
+        pending.append((block, executor.submit(fn, block[2], block[1])))
+        if len(pending) >= window:
+            block, future = pending.popleft()
+            yield block, future.result()
+
+    while pending:
+        block, future = pending.popleft()
+        yield block, future.result()
+
+
+class XLSXWriter:
+    """
+    Write a table (the header row first) into an xlsx file.
+
+    `export_style` is the `default_export_style` of `CustomXLSXRenderer`.
+    With `processes` > 1 the sheet XML is built by a process pool, started
+    once per process and shared by all exports. If the interpreter can't
+    start worker processes (see `can_start_processes`), it is built in the
+    current process instead.
+    """
+
+    block_size = 5000
+    # Workers only need this module, not a copy of the serving process
+    start_method = "spawn"
+
+    def __init__(self, export_style, processes=None, max_rows=MAX_SHEET_ROWS):
+        self.export_style = export_style
+        self.processes = processes
+        self.max_rows = max_rows
+
+    def write(self, file, table):
+        rows = iter(table)
+        header = next(rows, None)
+        with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive:
+            sheet_count = self.write_sheets(archive, header, rows)
+            self.write_package(archive, sheet_count)
+
+    def iter_blocks(self, rows, first_row):
+        """
+        Yield `(sheet_index, first_row, rows)` blocks, starting a new sheet
+        whenever the current one is full.
+        """
+        capacity = self.max_rows - first_row + 1
+        sheet_index = row_count = 0
+        while block := list(islice(rows, min(self.block_size, capacity - row_count))):
+            yield sheet_index, first_row + row_count, block
+            row_count += len(block)
+            if row_count == capacity:
+                sheet_index += 1
+                row_count = 0
+
+    def iter_rendered_blocks(self, blocks):
+        if not self.processes or self.processes < 2:
+            for block in blocks:
+                yield block, render_rows(block[2], block[1])
+            return
+
+        if not can_start_processes(self.start_method):
+            logger.warning(
+                "Can't start %s worker processes from %s, writing xlsx in process",
+                self.start_method,
+                os.fsdecode(get_executable()),
+            )
+            for block in blocks:
+                yield block, render_rows(block[2], block[1])
+            return
+
+        pool = get_process_pool(self.processes, self.start_method)
+        try:
+            yield from _bounded_map(pool, render_rows, blocks, self.processes * 2)
+        except BrokenProcessPool:
+            # A worker died, the next export starts a new pool
+            _discard_process_pool(pool)
+            raise
+
+    def write_sheets(self, archive, header, rows):
+        first_row = 1 if header is None else 2
+        blocks = self.iter_blocks(rows, first_row)
+        sheet = None
+        sheet_index = -1
+        for (block_sheet_index, _, _), content in self.iter_rendered_blocks(blocks):
+            if block_sheet_index != sheet_index:
+                if sheet is not None:
+                    self.close_sheet(sheet)
+                sheet_index = block_sheet_index
+                sheet = self.open_sheet(archive, sheet_index, header)
+            sheet.write(content)
+
+        if sheet is None:
+            sheet_index = 0
+            sheet = self.open_sheet(archive, sheet_index, header)
+        self.close_sheet(sheet)
+        return sheet_index + 1
+
+    def get_pane(self, header):
+        freeze_panes = self.export_style.get("freeze_panes")
+        if header is None or not isinstance(freeze_panes, str):
+            return ""
+
+        column, row = coordinate_from_string(freeze_panes)
+        x_split = column_index_from_string(column) - 1
+        y_split = row - 1
+        if not x_split and not y_split:
+            return ""
+
+        active_pane = {
+            (False, True): "bottomLeft",
+            (True, False): "topRight",
+            (True, True): "bottomRight",
+        }[(bool(x_split), bool(y_split))]
+        splits = (f' xSplit="{x_split}"' if x_split else "") + (
+            f' ySplit="{y_split}"' if y_split else ""
+        )
+        return (
+            f'<pane{splits} topLeftCell="{freeze_panes}" '
+            f'activePane="{active_pane}" state="frozen"/>'
+        )
+
+    def open_sheet(self, archive, sheet_index, header):
+        sheet = archive.open(
+            f"xl/worksheets/sheet{sheet_index + 1}.xml", "w", force_zip64=True
+        )
+        sheet.write(
+            (
+                f'{XML_DECLARATION}<worksheet xmlns="{MAIN_NS}">'
+                f'<sheetViews><sheetView workbookViewId="0">{self.get_pane(header)}'
+                f'</sheetView></sheetViews><sheetFormatPr defaultRowHeight="15"/>'
+                f"<sheetData>"
+            ).encode()
+        )
+        if header is not None:
+            height = self.export_style.get("header_height")
+            sheet.write(render_rows([header], 1, HEADER_STYLE, height))
+        return sheet
+
+    def close_sheet(self, sheet):
+        sheet.write(
+            b'</sheetData><pageMargins left="0.75" right="0.75" top="1" bottom="1"'
+            b' header="0.5" footer="0.5"/></worksheet>'
+        )
+        sheet.close()
+
+    def get_sheet_name(self, sheet_index):
+        # The sheet names `Workbook.create_sheet` would give
+        return f"Sheet{sheet_index}" if sheet_index else "Sheet"
+
+    def get_styles(self):
+        export_style = self.export_style
+        fonts = [DEFAULT_FONT, export_style["header_font"]]
+        fills = [PatternFill(), PatternFill("gray125"), export_style["header_fill"]]
+        alignment = export_style.get("header_alignment") or Alignment()
+        return (
+            f'{XML_DECLARATION}<styleSheet xmlns="{MAIN_NS}">'
+            f'<fonts count="2">{_to_xml(*fonts)}</fonts>'
+            f'<fills count="3">{_to_xml(*fills)}</fills>'
+            f'<borders count="1">{_to_xml(Border())}</borders>'
+            f'<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" '
+            f'borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" '
+            f'borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="2" '
+            f'borderId="0" xfId="0" applyFont="1" applyFill="1" applyAlignment="1">'
+            f"{_to_xml(alignment)}</xf></cellXfs>"
+            f'<cellStyles count="1"><cellStyle name="Normal" xfId="0" '
+            f'builtinId="0"/></cellStyles></styleSheet>'
+        )
+
+    def write_package(self, archive, sheet_count):
+        sheet_indexes = range(sheet_count)
+        archive.writestr(
+            "[Content_Types].xml",
+            f'{XML_DECLARATION}<Types xmlns="'
+            f'http://schemas.openxmlformats.org/package/2006/content-types">'
+            f'<Default Extension="rels" ContentType="'
+            f'application/vnd.openxmlformats-package.relationships+xml"/>'
+            f'<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" '
+            f'ContentType="{CONTENT_TYPE}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/styles.xml" '
+            f'ContentType="{CONTENT_TYPE}.styles+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{index + 1}.xml" '
+                f'ContentType="{CONTENT_TYPE}.worksheet+xml"/>'
+                for index in sheet_indexes
+            )
+            + "</Types>",
+        )
+        archive.writestr(
+            "_rels/.rels",
+            f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" '
+            f'Target="xl/workbook.xml"/></Relationships>',
+        )
+        sheets = "".join(
+            f"<sheet name={quoteattr(self.get_sheet_name(index))} "
+            f'sheetId="{index + 1}" r:id="rId{index + 1}"/>'
+            for index in sheet_indexes
+        )
+        print_titles = "".join(
+            f'<definedName name="_xlnm.Print_Titles" localSheetId="{index}">'
+            f"'{escape(self.get_sheet_name(index))}'!$1:$1</definedName>"
+            for index in sheet_indexes
+        )
+        archive.writestr(
+            "xl/workbook.xml",
+            f'{XML_DECLARATION}<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+            f"<sheets>{sheets}</sheets>"
+            f"<definedNames>{print_titles}</definedNames></workbook>",
+        )
+        archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">'
+            + "".join(
+                f'<Relationship Id="rId{index + 1}" Type="{REL_NS}/worksheet" '
+                f'Target="worksheets/sheet{index + 1}.xml"/>'
+                for index in sheet_indexes
+            )
+            + f'<Relationship Id="rId{sheet_count + 1}" Type="{REL_NS}/styles" '
+            f'Target="styles.xml"/></Relationships>',
+        )
+        archive.writestr("xl/styles.xml", self.get_styles())
+
+
+def _get_relationships(archive, part):
+    """
+    Return the `(type, id, target part)` of the relationships of a part,
+    `""` for the package.
+    """
+    folder, name = posixpath.split(part)
+    try:
+        root = parse_xml(archive.open(posixpath.join(folder, "_rels", f"{name}.rels")))
+    except KeyError:
+        return []
+
+    relationships = []
+    for relationship in root.getroot().iter(f"{{{PACKAGE_REL_NS}}}Relationship"):
+        target = relationship.get("Target")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        relationship_type = relationship.get("Type").rsplit("/", 1)[-1]
+        relationships.append((relationship_type, relationship.get("Id"), target))
+
+    return relationships
+
+
+def _cast_number(value):
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class XLSXReader:
+    """
+    Read the cell values of an xlsx file, a sheet at a time.
+
+    Formulas read as their cached values. Rows are numbered as in the sheet:
+    the rows missing from it are read as empty rows.
+    """
+
+    # Bytes of sheet XML read at once
+    block_size = 256 * 1024
+
+    def __init__(self, file):
+        self.archive = zipfile.ZipFile(file)
+        self.workbook_part = next(
+            target
+            for relationship_type, _, target in _get_relationships(self.archive, "")
+            if relationship_type == "officeDocument"
+        )
+        relationships = _get_relationships(self.archive, self.workbook_part)
+        self.parts = {id_: target for _, id_, target in relationships}
+        self.part_types = {
+            relationship_type: target for relationship_type, _, target in relationships
+        }
+        self.read_workbook()
+        self.read_styles()
+        self._shared_strings = None
+
+    def close(self):
+        self.archive.close()
+
+    def read_workbook(self):
+        root = parse_xml(self.archive.open(self.workbook_part)).getroot()
+        self.sheets = [
+            (sheet.get("name"), self.parts[sheet.get(f"{{{REL_NS}}}id")])
+            for sheet in root.iter(f"{{{MAIN_NS}}}sheet")
+        ]
+        view = root.find(f"{{{MAIN_NS}}}bookViews/{{{MAIN_NS}}}workbookView")
+        self.active = int(view.get("activeTab", 0)) if view is not None else 0
+        properties = root.find(f"{{{MAIN_NS}}}workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in (
+            "1",
+            "true",
+        )
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+    def read_styles(self):
+        """
+        Find the cell styles formatting numbers as dates or durations.
+        """
+        self.date_styles = set()
+        self.timedelta_styles = set()
+        part = self.part_types.get("styles")
+        if part is None:
+            return
+
+        root = parse_xml(self.archive.open(part)).getroot()
+        number_formats = dict(BUILTIN_FORMATS)
+        for number_format in root.iter(f"{{{MAIN_NS}}}numFmt"):
+            number_formats[int(number_format.get("numFmtId"))] = number_format.get(
+                "formatCode"
+            )
+
+        cell_styles = root.find(f"{{{MAIN_NS}}}cellXfs")
+        if cell_styles is None:
+            return
+
+        for index, style in enumerate(cell_styles.iter(f"{{{MAIN_NS}}}xf")):
+            number_format = number_formats.get(int(style.get("numFmtId", 0)))
+            if number_format and is_date_format(number_format):
+                self.date_styles.add(index)
+                if is_timedelta_format(number_format):
+                    self.timedelta_styles.add(index)
+
+    @property
+    def shared_strings(self):
+        if self._shared_strings is None:
+            part = self.part_types.get("sharedStrings")
+            self._shared_strings = []
+            if part is not None:
+                with self.archive.open(part) as file:
+                    self._shared_strings = read_string_table(file)
+
+        return self._shared_strings
+
+    def get_sheet_part(self, sheet=None):
+        """
+        Return the part of a sheet, by name or index, the active one by default.
+        A string of digits, e.g. from a query parameter, is an index unless a
+        sheet has that name.
+        """
+        if sheet is None:
+            sheet = self.active
+        if isinstance(sheet, str):
+            for name, part in self.sheets:
+                if name == sheet:
+                    return part
+            if not (sheet.isascii() and sheet.isdigit()):
+                raise KeyError(f"Worksheet {sheet} does not exist.")
+            sheet = int(sheet)
+
+        try:
+            return self.sheets[sheet][1]
+        except IndexError:
+            raise KeyError(f"Worksheet index {sheet} does not exist.")
+
+    def get_value(self, cell):
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            child = cell.find(INLINE_STRING_TAG)
+            if child is None:
+                return None
+            # The plain text, or the text of the formatted runs
+            text = child.findtext(TEXT_TAG)
+            if text is None:
+                text = "".join(run.findtext(TEXT_TAG, "") for run in child.iter(RUN_TAG))
+            return text
+
+        value = cell.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+
+        if data_type == "n":
+            value = _cast_number(value)
+            style = int(cell.get("s", 0))
+            if style in self.date_styles:
+                try:
+                    return from_excel(
+                        value, self.epoch, timedelta=style in self.timedelta_styles
+                    )
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return value
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return value
+
+    def iter_row_elements(self, part):
+        """
+        Yield the `<row>` elements of a sheet. The sheet XML is parsed
+        `block_size` bytes of rows at a time, each block in one go.
+        """
+        with self.archive.open(part) as file:
+            buffer = b""
+            start_tag = None
+            while True:
+                data = file.read(self.block_size)
+                buffer += data
+                if start_tag is None:
+                    worksheet = WORKSHEET_RE.search(buffer)
+                    sheet_data = worksheet and SHEET_DATA_RE.search(buffer)
+                    if not sheet_data:
+                        if data:
+                            continue
+                        return
+                    if sheet_data.group("empty"):
+                        return
+
+                    # The rows are parsed inside the worksheet element, which
+                    # declares the namespaces
+                    prefix = worksheet.group("prefix") or b""
+                    start_tag = worksheet.group()
+                    end_tag = b"</%sworksheet>" % prefix
+                    row_end = b"</%srow>" % prefix
+                    sheet_data_end = b"</%ssheetData>" % prefix
+                    start = sheet_data.end()
+                    buffer = buffer[start:]
+
+                if data:
+                    end = buffer.rfind(row_end)
+                    if end < 0:
+                        continue
+                    end += len(row_end)
+                    rows, buffer = buffer[:end], buffer[end:]
+                else:
+                    end = buffer.find(sheet_data_end)
+                    rows = buffer[:end] if end >= 0 else buffer
+
+                if rows.strip():
+                    yield from parse_xml_string(start_tag + rows + end_tag)
+                if not data:
+                    return
+
+    def iter_rows(self, sheet=None, get_columns=None):
+        """
+        Yield the values of the rows of a sheet as tuples.
+
+        `get_columns` is called with the values of the first row and returns
+        the indexes of the columns to read, from it on. Other cells are
+        skipped without being converted. By default the columns of the first
+        row are read.
+        """
+        positions = None
+        width = 0
+        row_number = 0
+        column_indexes = {}
+        for element in self.iter_row_elements(self.get_sheet_part(sheet)):
+            number = int(element.get("r", row_number + 1))
+            if positions is not None:
+                empty_row = (None,) * width
+                for _ in range(row_number + 1, number):
+                    yield empty_row
+            row_number = number
+
+            values = [None] * width
+            column = -1
+            for cell in element:
+                reference = cell.get("r")
+                if reference is None:
+                    column += 1
+                else:
+                    letters = reference.rstrip("0123456789")
+                    column = column_indexes.get(letters)
+                    if column is None:
+                        column = column_indexes[letters] = (
+                            column_index_from_string(letters) - 1
+                        )
+
+                if positions is None:
+                    if column >= len(values):
+                        values.extend([None] * (column + 1 - len(values)))
+                    values[column] = self.get_value(cell)
+                    continue
+
+                position = positions.get(column)
+                if position is not None:
+                    values[position] = self.get_value(cell)
+
+            if positions is None:
+                # The first row
+                indexes = range(len(values))
+                if get_columns is not None:
+                    indexes = get_columns(values)
+                positions = {index: i for i, index in enumerate(indexes)}
+                width = len(positions)
+                values = [
+                    values[index] if index < len(values) else None for index in indexes
+                ]
+
+            yield tuple(values)